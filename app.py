@@ -1,9 +1,14 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, date
-import json
+import io
 import os
-from data_manager import DataManager
+import tempfile
+import perf
+from backup_scheduler import start_backup_scheduler
+from data_manager import create_data_manager, new_member_id
+from exports import report_bytes, write_report
+from photo_store import get_photo_store
+from view_cache import get_view_cache
 
 # Configure page
 st.set_page_config(
@@ -13,8 +18,25 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize data manager
-data_manager = DataManager()
+# Rerun timing (MASJED_PERF only) starts before the data manager is opened
+perf.start_rerun()
+
+# Initialize data manager (MASJED_STORAGE selects json, journal or sqlite storage);
+# one manager per process serves every session and rerun, so its parsed data and
+# indexes are kept between reruns; the data itself is read when a page first needs it
+data_manager = create_data_manager()
+
+# One background backup thread per process (MASJED_BACKUP_INTERVAL minutes, 0 disables)
+backup_scheduler = start_backup_scheduler(create_data_manager)
+
+# Shared across sessions so the thumbnail cache survives reruns
+photo_store = get_photo_store()
+
+# Derived tables and totals, computed once per data change for all sessions
+view_cache = get_view_cache()
+
+# Reports small enough to keep in the view cache; the history report is always streamed to a file
+SHARED_REPORTS = ('members', 'scoring')
 
 # Custom CSS for mosque theme
 st.markdown("""
@@ -62,15 +84,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def get_level_info(points):
-    """Calculate level and progress based on points"""
-    if points < 20:
-        return 0, points, 20
-    else:
-        level = 1 + (points - 20) // 30
-        points_in_level = (points - 20) % 30
-        points_for_next = 30
-        return level, points_in_level, points_for_next
+def shared_view(view, compute):
+    """A derived view shared by every session until the data or the level rules change"""
+    return view_cache.get(view, data_manager, compute, repr(data_manager.level_rules.to_dict()))
 
 def get_score_bar_color(progress_percent):
     """Generate color based on progress percentage"""
@@ -83,25 +99,6 @@ def get_score_bar_color(progress_percent):
     else:
         return "#44ff44"  # Green
 
-def get_achievement_badges(level):
-    """Get achievement badges based on level"""
-    badges = []
-    
-    if level >= 1:
-        badges.append({"name": "آغازگر", "emoji": "🌟", "description": "رسیدن به سطح ۱"})
-    if level >= 3:
-        badges.append({"name": "پیشرو", "emoji": "⭐", "description": "رسیدن به سطح ۳"})
-    if level >= 5:
-        badges.append({"name": "فعال", "emoji": "✨", "description": "رسیدن به سطح ۵"})
-    if level >= 10:
-        badges.append({"name": "نمونه", "emoji": "🏆", "description": "رسیدن به سطح ۱۰"})
-    if level >= 15:
-        badges.append({"name": "ستاره", "emoji": "💎", "description": "رسیدن به سطح ۱۵"})
-    if level >= 20:
-        badges.append({"name": "قهرمان", "emoji": "👑", "description": "رسیدن به سطح ۲۰"})
-    
-    return badges
-
 def generate_certificate_html(member_name, level, points, date):
     """Generate HTML certificate for a member"""
     return f"""
@@ -170,9 +167,11 @@ def generate_certificate_html(member_name, level, points, date):
     </div>
     """
 
-def render_score_bar(points, max_points_for_level):
-    """Render animated score bar"""
-    level, points_in_level, points_for_next = get_level_info(points)
+def render_score_bar(progress):
+    """Render animated score bar from a member's derived level progress"""
+    level = progress['level']
+    points_in_level = progress['points_in_level']
+    points_for_next = progress['points_for_next']
     progress_percent = (points_in_level / points_for_next) * 100
     color = get_score_bar_color(progress_percent)
     
@@ -196,29 +195,74 @@ def render_score_bar(points, max_points_for_level):
     
     return level
 
-def save_uploaded_photo(uploaded_file, member_index):
-    """Save uploaded photo and return the file path"""
+def save_uploaded_photo(uploaded_file):
+    """Save uploaded photo (deduplicated by content, thumbnails built once) and return the file path"""
     try:
         if uploaded_file is not None:
-            # Create photos directory if it doesn't exist
-            photos_dir = "member_photos"
-            if not os.path.exists(photos_dir):
-                os.makedirs(photos_dir)
-            
-            # Generate unique filename
             file_extension = uploaded_file.name.split('.')[-1]
-            file_path = os.path.join(photos_dir, f"member_{member_index}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_extension}")
-            
-            # Save the file
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
-            return file_path
+            return photo_store.save(uploaded_file.getvalue(), file_extension)
         return None
     except Exception as e:
         print(f"Error saving photo: {e}")
         return None
 
+def collect_orphan_photos():
+    """Remove stored photos that no member uses any more"""
+    try:
+        photo_store.collect_garbage(m.get('photo_path') for m in data_manager.iter_members())
+    except Exception as e:
+        print(f"Error removing unused photos: {e}")
+
+# Member list controls: label -> DataManager.query_members sort key
+MEMBER_SORT_OPTIONS = {
+    "ترتیب ثبت": "added",
+    "نام خانوادگی": "name",
+    "بیشترین امتیاز": "points_desc",
+    "کمترین امتیاز": "points_asc",
+}
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+
+def paginated_member_list(key_prefix):
+    """Render search, sort and paging controls and return only the visible slice of members"""
+    page_key = f"{key_prefix}_page"
+    
+    def reset_page():
+        st.session_state[page_key] = 1
+    
+    col_search, col_sort, col_size = st.columns([3, 2, 1])
+    with col_search:
+        search = st.text_input("🔍 جستجوی نام", key=f"{key_prefix}_search", on_change=reset_page)
+    with col_sort:
+        sort_label = st.selectbox("مرتب‌سازی:", list(MEMBER_SORT_OPTIONS), key=f"{key_prefix}_sort", on_change=reset_page)
+    with col_size:
+        page_size = st.selectbox("تعداد در صفحه:", PAGE_SIZE_OPTIONS, key=f"{key_prefix}_page_size", on_change=reset_page)
+    
+    sort_by = MEMBER_SORT_OPTIONS[sort_label]
+    page = st.session_state.get(page_key, 1)
+    total, members = data_manager.query_members(search, sort_by, (page - 1) * page_size, page_size)
+    
+    page_count = max(1, (total + page_size - 1) // page_size)
+    if page > page_count:
+        # The list shrank (deletion or a narrower search) under the current page
+        page = page_count
+        total, members = data_manager.query_members(search, sort_by, (page - 1) * page_size, page_size)
+    st.session_state[page_key] = page
+    
+    if page_count > 1:
+        st.number_input(f"صفحه (از {page_count}):", min_value=1, max_value=page_count, key=page_key)
+    if total:
+        first = (page - 1) * page_size + 1
+        st.caption(f"نمایش {first} تا {first + len(members) - 1} از {total} عضو")
+    
+    return members
+
+def parse_birth_date(value):
+    """A stored birth date as a date, None when it is missing or not YYYY-MM-DD"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
 def member_management_page():
     """Member management page"""
     st.markdown("""
@@ -250,15 +294,15 @@ def member_management_page():
     
     if st.button("افزودن عضو", type="primary"):
         if first_name and last_name:
-            # Get current member count for photo naming
-            member_count = data_manager.get_member_count()
+            member_id = new_member_id()
             
             # Save photo if uploaded
             photo_path = None
             if uploaded_photo:
-                photo_path = save_uploaded_photo(uploaded_photo, member_count)
+                photo_path = save_uploaded_photo(uploaded_photo)
             
             member_data = {
+                "id": member_id,
                 "first_name": first_name,
                 "last_name": last_name,
                 "birth_date": birth_date.strftime("%Y-%m-%d"),
@@ -275,68 +319,100 @@ def member_management_page():
                 st.error("❌ خطا در افزودن عضو!")
         else:
             st.error("⚠️ لطفاً نام و نام خانوادگی را وارد کنید!")
-    
+
+    # Bulk import from a roster file
+    with st.expander("📥 ورود گروهی اعضا (CSV/Excel)"):
+        st.caption("ستون‌ها: نام، نام خانوادگی و در صورت تمایل تاریخ تولد، مسئولیت، توضیحات، امتیاز")
+        roster_file = st.file_uploader("فایل اعضا", type=['csv', 'xlsx'], key="roster_file")
+        if roster_file and st.button("ورود اعضا"):
+            from member_import import import_members
+            try:
+                with st.spinner("در حال ورود اعضا..."):
+                    result = import_members(data_manager, roster_file, roster_file.name)
+            except ValueError as e:
+                st.error(f"❌ خطا در خواندن فایل: {e}")
+            else:
+                st.success(f"✅ {result['added']} عضو از {result['rows']} ردیف اضافه شد")
+                if result['duplicates']:
+                    st.warning(f"⚠️ {len(result['duplicates'])} ردیف تکراری بود و اضافه نشد")
+                if result['errors']:
+                    st.error(f"❌ {len(result['errors'])} ردیف نامعتبر بود:")
+                    st.text("\n".join(f"سطر {line}: {message}" for line, message in result['errors'][:100]))
+
     st.divider()
-    
+
     # Display existing members
     st.subheader("📋 لیست اعضای فعلی")
     
-    members = data_manager.get_all_members()
-    
-    if not members:
+    if data_manager.get_member_count() == 0:
         st.info("هیچ عضوی ثبت نشده است.")
     else:
-        for idx, member in enumerate(members):
+        members = paginated_member_list("manage")
+        if not members:
+            st.info("عضوی با این مشخصات یافت نشد.")
+        
+        for member in members:
+            member_id = member['id']
             with st.expander(f"👤 {member['first_name']} {member['last_name']}"):
                 # Display current photo if exists
-                if member.get('photo_path') and os.path.exists(member['photo_path']):
+                photo = photo_store.thumbnail(member.get('photo_path'), 150)
+                if photo:
                     col_photo, col_info = st.columns([1, 3])
                     with col_photo:
-                        st.image(member['photo_path'], width=150, caption="تصویر فعلی")
+                        st.image(photo, width=150, caption="تصویر فعلی")
                 
                 col1, col2, col3 = st.columns([2, 2, 1])
                 
                 with col1:
-                    new_first_name = st.text_input("نام", value=member['first_name'], key=f"edit_fname_{idx}")
+                    new_first_name = st.text_input("نام", value=member['first_name'], key=f"edit_fname_{member_id}")
                     new_birth_date = st.date_input("تاریخ تولد", 
-                                                 value=datetime.strptime(member['birth_date'], "%Y-%m-%d").date(),
-                                                 key=f"edit_bdate_{idx}",
+                                                 value=parse_birth_date(member.get('birth_date')),
+                                                 key=f"edit_bdate_{member_id}",
                                                  max_value=date.today())
                 
                 with col2:
-                    new_last_name = st.text_input("نام خانوادگی", value=member['last_name'], key=f"edit_lname_{idx}")
-                    new_responsibility = st.text_input("مسئولیت", value=member.get('responsibility', ''), key=f"edit_resp_{idx}")
+                    new_last_name = st.text_input("نام خانوادگی", value=member['last_name'], key=f"edit_lname_{member_id}")
+                    new_responsibility = st.text_input("مسئولیت", value=member.get('responsibility', ''), key=f"edit_resp_{member_id}")
                 
-                new_description = st.text_area("توضیحات", value=member.get('description', ''), key=f"edit_desc_{idx}")
+                new_description = st.text_area("توضیحات", value=member.get('description', ''), key=f"edit_desc_{member_id}")
                 
                 # Photo upload for editing
-                new_photo = st.file_uploader("تغییر تصویر (اختیاری)", type=['png', 'jpg', 'jpeg'], key=f"edit_photo_{idx}")
+                new_photo = st.file_uploader("تغییر تصویر (اختیاری)", type=['png', 'jpg', 'jpeg'], key=f"edit_photo_{member_id}")
                 
                 with col3:
-                    if st.button("ویرایش", key=f"edit_{idx}", type="secondary"):
+                    if st.button("ویرایش", key=f"edit_{member_id}", type="secondary"):
                         # Save new photo if uploaded
                         photo_path = member.get('photo_path')
                         if new_photo:
-                            photo_path = save_uploaded_photo(new_photo, idx)
+                            photo_path = save_uploaded_photo(new_photo)
                         
                         updated_member = {
                             "first_name": new_first_name,
                             "last_name": new_last_name,
-                            "birth_date": new_birth_date.strftime("%Y-%m-%d"),
+                            "birth_date": new_birth_date.strftime("%Y-%m-%d") if new_birth_date else None,
                             "responsibility": new_responsibility,
                             "description": new_description,
-                            "points": member.get('points', 0),
                             "photo_path": photo_path
                         }
                         
-                        if data_manager.update_member(idx, updated_member):
+                        # Points are left out so the current total is kept;
+                        # the version check refuses the edit if someone else
+                        # changed this member since the page was drawn
+                        
+                        if data_manager.update_member_by_id(member_id, updated_member,
+                                                            expected_version=member.get('version', 0)):
+                            if new_photo:
+                                collect_orphan_photos()
                             st.success("✅ اطلاعات به‌روزرسانی شد!")
                             st.rerun()
+                        elif (data_manager.get_member_by_id(member_id) or {}).get('version', 0) != member.get('version', 0):
+                            st.warning("⚠️ اطلاعات این عضو همزمان توسط کاربر دیگری تغییر کرد؛ صفحه را تازه کنید و دوباره ویرایش کنید.")
                         else:
                             st.error("❌ خطا در به‌روزرسانی!")
                     
-                    if st.button("حذف", key=f"delete_{idx}", type="secondary"):
-                        if data_manager.delete_member(idx):
+                    if st.button("حذف", key=f"delete_{member_id}", type="secondary"):
+                        if data_manager.delete_member_by_id(member_id):
+                            collect_orphan_photos()
                             st.success("✅ عضو حذف شد!")
                             st.rerun()
                         else:
@@ -344,6 +420,205 @@ def member_management_page():
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+@st.fragment
+def render_scoring_card(member_id):
+    """Render one member's scoring card: level, progress, score buttons, history and certificate
+
+    Runs as a fragment, so a score tap reruns only this card instead of the whole page.
+    """
+    # Re-read on every fragment rerun; the card's arguments are fixed at the last full run
+    member = data_manager.get_member_by_id(member_id)
+    if member is None:
+        return
+    
+    with st.container():
+        st.markdown(f"""
+        <div class="member-card">
+            <h3>👤 {member['first_name']} {member['last_name']}</h3>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Create columns - add photo column if photo exists
+        photo = photo_store.thumbnail(member.get('photo_path'), 100)
+        if photo:
+            col_photo, col1, col2, col3, col4 = st.columns([1, 2, 3, 1, 1])
+            with col_photo:
+                st.image(photo, width=100)
+        else:
+            col1, col2, col3, col4 = st.columns([2, 3, 1, 1])
+        
+        with col1:
+            current_points = member.get('points', 0)
+            progress = data_manager.get_member_progress(member_id)
+            level = progress['level']
+            
+            st.markdown(f"""
+            <div class="level-badge">
+                سطح {level}
+            </div>
+            """, unsafe_allow_html=True)
+            
+            st.write(f"**مجموع امتیازات:** {current_points}")
+            st.write(f"**رتبه:** {data_manager.get_member_rank(member_id)} از {data_manager.get_member_count()}")
+            
+            # Display achievement badges
+            badges = progress['badges']
+            if badges:
+                badge_text = " ".join([f"{badge['emoji']}" for badge in badges])
+                st.markdown(f"**نشان‌ها:** {badge_text}")
+        
+        with col2:
+            st.write("**نوار پیشرفت:**")
+            render_score_bar(progress)
+        
+        with col3:
+            # Relative changes are applied under the write lock, so taps from
+            # several operators at once all count
+            if st.button("➕", key=f"add_{member_id}", help="افزایش امتیاز"):
+                data_manager.apply_points_batch([(member_id, 1, "افزایش یک امتیاز")])
+                st.rerun(scope="fragment")
+            
+            if st.button("⬆️", key=f"add5_{member_id}", help="افزایش 5 امتیاز"):
+                data_manager.apply_points_batch([(member_id, 5, "افزایش 5 امتیاز")])
+                st.rerun(scope="fragment")
+        
+        with col4:
+            if st.button("➖", key=f"sub_{member_id}", help="کاهش امتیاز"):
+                data_manager.apply_points_batch([(member_id, -1, "کاهش یک امتیاز")])
+                st.rerun(scope="fragment")
+            
+            if st.button("⬇️", key=f"sub5_{member_id}", help="کاهش 5 امتیاز"):
+                data_manager.apply_points_batch([(member_id, -5, "کاهش 5 امتیاز")])
+                st.rerun(scope="fragment")
+        
+        # Custom point adjustment and history
+        with st.expander("تنظیم دستی امتیاز و تاریخچه"):
+            col_adjust, col_reason = st.columns([2, 3])
+            
+            with col_adjust:
+                new_points = st.number_input(
+                    "امتیاز جدید:",
+                    min_value=0,
+                    value=current_points,
+                    key=f"custom_points_{member_id}"
+                )
+            
+            with col_reason:
+                reason = st.text_input(
+                    "دلیل تغییر:",
+                    key=f"reason_{member_id}",
+                    placeholder="مثلاً: برگزاری نماز جماعت"
+                )
+            
+            if st.button("اعمال تغییر", key=f"apply_custom_{member_id}"):
+                if data_manager.update_member_points_by_id(member_id, new_points, reason if reason else "تنظیم دستی",
+                                                           expected_version=member.get('version', 0)):
+                    st.rerun(scope="fragment")
+                else:
+                    st.warning("⚠️ امتیاز این عضو همزمان توسط کاربر دیگری تغییر کرد؛ مقدار جدید را بررسی و دوباره اعمال کنید.")
+            
+            # Display history
+            st.divider()
+            st.write("**📜 تاریخچه امتیازات:**")
+            
+            history_count = data_manager.get_member_history_count_by_id(member_id)
+            if history_count:
+                # Show 10 entries per page, newest first; only that page is read from disk
+                page_size = 10
+                page_count = (history_count + page_size - 1) // page_size
+                history_page = 1
+                if page_count > 1:
+                    history_page = st.number_input(
+                        f"صفحه (از {page_count}):",
+                        min_value=1,
+                        max_value=page_count,
+                        value=1,
+                        key=f"history_page_{member_id}"
+                    )
+                end = history_count - (history_page - 1) * page_size
+                start = max(0, end - page_size)
+                history = data_manager.get_member_history_by_id(member_id, start, end - start)
+                for entry in reversed(history):
+                    change_symbol = "📈" if entry['change'] > 0 else "📉" if entry['change'] < 0 else "➡️"
+                    change_text = f"+{entry['change']}" if entry['change'] > 0 else str(entry['change'])
+                    
+                    st.markdown(f"""
+                    <div style="background: #f0f8f0; padding: 8px; margin: 5px 0; border-radius: 5px; border-right: 3px solid #1f5f3f;">
+                        {change_symbol} <strong>{change_text}</strong> امتیاز 
+                        ({entry['old_points']} ← {entry['new_points']})
+                        <br>
+                        <small>📅 {entry['timestamp']}</small>
+                        <br>
+                        <small>💬 {entry['reason']}</small>
+                    </div>
+                    """, unsafe_allow_html=True)
+            else:
+                st.info("هنوز تاریخچه‌ای ثبت نشده است.")
+            
+            # Certificate section
+            if level >= 1:
+                st.divider()
+                st.write("**🏅 گواهینامه و نشان‌ها:**")
+                
+                # Display all earned badges
+                badges = progress['badges']
+                if badges:
+                    cols = st.columns(min(len(badges), 4))
+                    for i, badge in enumerate(badges):
+                        with cols[i % len(cols)]:
+                            st.markdown(f"""
+                            <div style="background: #e8f5e8; padding: 10px; border-radius: 10px; text-align: center; margin: 5px;">
+                                <div style="font-size: 40px;">{badge['emoji']}</div>
+                                <div style="font-size: 14px; font-weight: bold; color: #1f5f3f;">{badge['name']}</div>
+                                <div style="font-size: 11px; color: #666;">{badge['description']}</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+                
+                # Certificate generation button
+                if st.button("📜 نمایش گواهینامه", key=f"cert_{member_id}"):
+                    member_name = f"{member['first_name']} {member['last_name']}"
+                    cert_date = datetime.now().strftime("%Y/%m/%d")
+                    certificate_html = generate_certificate_html(member_name, level, current_points, cert_date)
+                    st.markdown(certificate_html, unsafe_allow_html=True)
+                    st.info("💡 برای چاپ یا ذخیره، از دکمه Print مرورگر استفاده کنید (Ctrl+P یا Cmd+P)")
+        
+        st.divider()
+
+def session_scoring_form(members):
+    """Score a whole prayer session at once: tick attendees and commit all awards in one write"""
+    st.write("**🕌 امتیازدهی جلسه‌ای:** حاضرین را علامت بزنید و همه امتیازها را یک‌جا ثبت کنید.")
+    
+    # A form keeps ticking checkboxes from triggering a rerun per click
+    with st.form("session_scoring_form", clear_on_submit=True):
+        col_points, col_reason = st.columns([1, 3])
+        with col_points:
+            session_points = st.number_input("امتیاز هر نفر:", value=1, step=1, key="session_points")
+        with col_reason:
+            session_reason = st.text_input("دلیل:", value="حضور در نماز جماعت", key="session_reason")
+        
+        attendees = []
+        cols = st.columns(3)
+        for i, member in enumerate(members):
+            with cols[i % len(cols)]:
+                if st.checkbox(f"{member['first_name']} {member['last_name']}", key=f"attend_{member['id']}"):
+                    attendees.append(member['id'])
+        
+        submitted = st.form_submit_button("✅ ثبت امتیاز حاضرین", type="primary")
+    
+    if submitted:
+        if not attendees:
+            st.warning("⚠️ هیچ عضوی انتخاب نشده است!")
+        elif data_manager.apply_points_batch([
+            (member_id, int(session_points), session_reason or "امتیازدهی جلسه‌ای")
+            for member_id in attendees
+        ]):
+            st.success(f"✅ امتیاز {len(attendees)} نفر ثبت شد!")
+            st.rerun()
+        else:
+            st.error("❌ خطا در ثبت امتیازها!")
+    
+    st.divider()
+
 def scoring_page():
     """Scoring page"""
     st.markdown("""
@@ -362,163 +637,85 @@ def scoring_page():
         st.markdown('</div>', unsafe_allow_html=True)
         return
     
-    # Display members with scoring interface
-    for idx, member in enumerate(members):
-        with st.container():
-            st.markdown(f"""
-            <div class="member-card">
-                <h3>👤 {member['first_name']} {member['last_name']}</h3>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Create columns - add photo column if photo exists
-            if member.get('photo_path') and os.path.exists(member['photo_path']):
-                col_photo, col1, col2, col3, col4 = st.columns([1, 2, 3, 1, 1])
-                with col_photo:
-                    st.image(member['photo_path'], width=100)
-            else:
-                col1, col2, col3, col4 = st.columns([2, 3, 1, 1])
-            
-            with col1:
-                current_points = member.get('points', 0)
-                level, points_in_level, points_for_next = get_level_info(current_points)
-                
-                st.markdown(f"""
-                <div class="level-badge">
-                    سطح {level}
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.write(f"**مجموع امتیازات:** {current_points}")
-                
-                # Display achievement badges
-                badges = get_achievement_badges(level)
-                if badges:
-                    badge_text = " ".join([f"{badge['emoji']}" for badge in badges])
-                    st.markdown(f"**نشان‌ها:** {badge_text}")
-            
-            with col2:
-                st.write("**نوار پیشرفت:**")
-                current_level = render_score_bar(current_points, points_for_next)
-            
-            with col3:
-                if st.button("➕", key=f"add_{idx}", help="افزایش امتیاز"):
-                    data_manager.update_member_points(idx, current_points + 1, "افزایش یک امتیاز")
-                    st.rerun()
-                
-                if st.button("⬆️", key=f"add5_{idx}", help="افزایش 5 امتیاز"):
-                    data_manager.update_member_points(idx, current_points + 5, "افزایش 5 امتیاز")
-                    st.rerun()
-            
-            with col4:
-                if st.button("➖", key=f"sub_{idx}", help="کاهش امتیاز"):
-                    new_points = max(0, current_points - 1)
-                    data_manager.update_member_points(idx, new_points, "کاهش یک امتیاز")
-                    st.rerun()
-                
-                if st.button("⬇️", key=f"sub5_{idx}", help="کاهش 5 امتیاز"):
-                    new_points = max(0, current_points - 5)
-                    data_manager.update_member_points(idx, new_points, "کاهش 5 امتیاز")
-                    st.rerun()
-            
-            # Custom point adjustment and history
-            with st.expander("تنظیم دستی امتیاز و تاریخچه"):
-                col_adjust, col_reason = st.columns([2, 3])
-                
-                with col_adjust:
-                    new_points = st.number_input(
-                        "امتیاز جدید:",
-                        min_value=0,
-                        value=current_points,
-                        key=f"custom_points_{idx}"
-                    )
-                
-                with col_reason:
-                    reason = st.text_input(
-                        "دلیل تغییر:",
-                        key=f"reason_{idx}",
-                        placeholder="مثلاً: برگزاری نماز جماعت"
-                    )
-                
-                if st.button("اعمال تغییر", key=f"apply_custom_{idx}"):
-                    data_manager.update_member_points(idx, new_points, reason if reason else "تنظیم دستی")
-                    st.rerun()
-                
-                # Display history
-                st.divider()
-                st.write("**📜 تاریخچه امتیازات:**")
-                
-                history = data_manager.get_member_history(idx)
-                if history:
-                    # Show last 10 entries
-                    for entry in reversed(history[-10:]):
-                        change_symbol = "📈" if entry['change'] > 0 else "📉" if entry['change'] < 0 else "➡️"
-                        change_text = f"+{entry['change']}" if entry['change'] > 0 else str(entry['change'])
-                        
-                        st.markdown(f"""
-                        <div style="background: #f0f8f0; padding: 8px; margin: 5px 0; border-radius: 5px; border-right: 3px solid #1f5f3f;">
-                            {change_symbol} <strong>{change_text}</strong> امتیاز 
-                            ({entry['old_points']} ← {entry['new_points']})
-                            <br>
-                            <small>📅 {entry['timestamp']}</small>
-                            <br>
-                            <small>💬 {entry['reason']}</small>
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.info("هنوز تاریخچه‌ای ثبت نشده است.")
-                
-                # Certificate section
-                if level >= 1:
-                    st.divider()
-                    st.write("**🏅 گواهینامه و نشان‌ها:**")
-                    
-                    # Display all earned badges
-                    badges = get_achievement_badges(level)
-                    if badges:
-                        cols = st.columns(min(len(badges), 4))
-                        for i, badge in enumerate(badges):
-                            with cols[i % len(cols)]:
-                                st.markdown(f"""
-                                <div style="background: #e8f5e8; padding: 10px; border-radius: 10px; text-align: center; margin: 5px;">
-                                    <div style="font-size: 40px;">{badge['emoji']}</div>
-                                    <div style="font-size: 14px; font-weight: bold; color: #1f5f3f;">{badge['name']}</div>
-                                    <div style="font-size: 11px; color: #666;">{badge['description']}</div>
-                                </div>
-                                """, unsafe_allow_html=True)
-                    
-                    # Certificate generation button
-                    if st.button("📜 نمایش گواهینامه", key=f"cert_{idx}"):
-                        member_name = f"{member['first_name']} {member['last_name']}"
-                        cert_date = datetime.now().strftime("%Y/%m/%d")
-                        certificate_html = generate_certificate_html(member_name, level, current_points, cert_date)
-                        st.markdown(certificate_html, unsafe_allow_html=True)
-                        st.info("💡 برای چاپ یا ذخیره، از دکمه Print مرورگر استفاده کنید (Ctrl+P یا Cmd+P)")
-            
-            st.divider()
+    scoring_mode = st.radio(
+        "حالت امتیازدهی:",
+        ["تک‌نفره", "جلسه‌ای (گروهی)"],
+        horizontal=True,
+        key="scoring_mode"
+    )
     
-    # Leaderboard
-    st.subheader("🥇 جدول رتبه‌بندی")
+    if scoring_mode == "جلسه‌ای (گروهی)":
+        session_scoring_form(members)
+    else:
+        # Display members with scoring interface, one page at a time
+        page_members = paginated_member_list("scoring")
+        if not page_members:
+            st.info("عضوی با این مشخصات یافت نشد.")
+        for member in page_members:
+            render_scoring_card(member['id'])
     
-    # Sort members by points
-    sorted_members = sorted(members, key=lambda x: x.get('points', 0), reverse=True)
+    render_leaderboard()
     
-    leaderboard_data = []
-    for rank, member in enumerate(sorted_members, 1):
-        points = member.get('points', 0)
-        level, _, _ = get_level_info(points)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+def render_leaderboard():
+    """Leaderboard table; refreshed on full reruns or on demand, not on every card update"""
+    col_title, col_refresh = st.columns([4, 1])
+    with col_title:
+        st.subheader("🥇 جدول رتبه‌بندی")
+    with col_refresh:
+        # Card updates rerun only their own fragment, so this table refreshes lazily
+        st.button("🔄 به‌روزرسانی", key="refresh_leaderboard", help="به‌روزرسانی جدول با آخرین امتیازها")
+    
+    def leaderboard_frame():
+        # Ranked order comes from the data manager's points index; no per-rerun sort
+        leaderboard_data = []
+        for rank, member in enumerate(data_manager.get_leaderboard(), 1):
+            leaderboard_data.append({
+                "رتبه": rank,
+                "نام": f"{member['first_name']} {member['last_name']}",
+                "امتیاز": member.get('points', 0),
+                "سطح": data_manager.get_member_progress(member['id'])['level']
+            })
         
-        leaderboard_data.append({
-            "رتبه": rank,
-            "نام": f"{member['first_name']} {member['last_name']}",
-            "امتیاز": points,
-            "سطح": level
-        })
-    
-    df = pd.DataFrame(leaderboard_data)
-    st.dataframe(df, use_container_width=True, hide_index=True)
+        # pandas is only imported by the pages that show tables or charts
+        import pandas as pd
+        return pd.DataFrame(leaderboard_data)
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.dataframe(shared_view("leaderboard", leaderboard_frame), use_container_width=True, hide_index=True)
+
+def performance_panel():
+    """Sidebar panel with the timings collected by perf (MASJED_PERF only)"""
+    with st.sidebar.expander("⏱️ کارایی"):
+        rows = perf.snapshot()
+        if rows:
+            import pandas as pd
+            df = pd.DataFrame([{
+                "مورد": row['name'],
+                "تعداد": row['count'],
+                "میانگین": f"{row['mean'] * 1000:.1f} ms" if row['unit'] == 's' else f"{row['mean']:.1f}",
+                "بیشینه": f"{row['max'] * 1000:.1f} ms" if row['unit'] == 's' else f"{row['max']:.0f}",
+                "مجموع": f"{row['total']:.2f} s" if row['unit'] == 's' else f"{row['total']:.0f} {row['unit']}"
+            } for row in rows])
+            st.dataframe(df, use_container_width=True, hide_index=True)
+        else:
+            st.caption("هنوز زمانی ثبت نشده است")
+        
+        cache = view_cache.stats()
+        st.caption(f"نماهای مشترک: {cache['entries']} مورد، {cache['hits']} استفاده مجدد، {cache['misses']} محاسبه")
+        
+        col_dump, col_reset = st.columns(2)
+        with col_dump:
+            if st.button("💾 ذخیره", key="perf_dump"):
+                try:
+                    st.success(f"ذخیره شد: {perf.dump()}")
+                except Exception as e:
+                    st.error(f"خطا در ذخیره: {e}")
+        with col_reset:
+            if st.button("🧹 پاک کردن", key="perf_reset"):
+                perf.reset()
+                st.rerun()
 
 def main():
     """Main application"""
@@ -555,15 +752,91 @@ def main():
     """, unsafe_allow_html=True)
     
     st.sidebar.markdown("---")
-    st.sidebar.info("💡 **راهنما:**\n\n• در صفحه مدیریت اعضا می‌توانید اعضای جدید اضافه کنید\n• در صفحه امتیازدهی می‌توانید امتیاز اعضا را مدیریت کنید\n• سیستم سطح‌بندی: سطح ۱ در ۲۰ امتیاز، سپس هر ۳۰ امتیاز یک سطح")
+    level_rules = data_manager.level_rules
+    st.sidebar.info(f"💡 **راهنما:**\n\n• در صفحه مدیریت اعضا می‌توانید اعضای جدید اضافه کنید\n• در صفحه امتیازدهی می‌توانید امتیاز اعضا را مدیریت کنید\n• سیستم سطح‌بندی: سطح ۱ در {level_rules.first_level_points} امتیاز، سپس هر {level_rules.points_per_level} امتیاز یک سطح")
     
     # Route to appropriate page
     if page == "مدیریت اعضا":
         member_management_page()
+        perf.finish_rerun("member_management_page")
     elif page == "امتیازدهی":
         scoring_page()
+        perf.finish_rerun("scoring_page")
     elif page == "گزارش‌ها و پشتیبان":
         reports_and_backup_page()
+        perf.finish_rerun("reports_and_backup_page")
+    
+    if perf.enabled():
+        performance_panel()
+
+def prepared_download(key, label, file_name, mime, build):
+    """Write a file with ``build(path)`` only when asked for, then offer the prepared file for download
+
+    ``build`` returns False (or raises) when the file could not be written;
+    nothing is offered for download then.
+    """
+    state_key = f"prepared_file_{key}"
+    
+    if st.button("⚙️ آماده‌سازی فایل", key=f"prepare_{key}"):
+        previous = st.session_state.pop(state_key, None)
+        if previous and os.path.exists(previous[0]):
+            os.remove(previous[0])
+        
+        fd, path = tempfile.mkstemp(prefix=f"{key}_", suffix=os.path.splitext(file_name)[1])
+        os.close(fd)
+        try:
+            with st.spinner("در حال آماده‌سازی فایل..."):
+                if build(path) is False:
+                    raise OSError(f"writing {file_name} failed")
+        except Exception as e:
+            os.remove(path)
+            st.error(f"❌ خطا در آماده‌سازی فایل: {e}")
+        else:
+            st.session_state[state_key] = (path, file_name)
+    
+    prepared = st.session_state.get(state_key)
+    if prepared and os.path.exists(prepared[0]):
+        path, prepared_name = prepared
+        with open(path, 'rb') as f:
+            st.download_button(
+                label=label,
+                data=f,
+                file_name=prepared_name,
+                mime=mime,
+                type="primary",
+                key=f"download_{key}"
+            )
+
+def report_download(report, label, file_prefix):
+    """Build a CSV report only when asked for, then offer it for download"""
+    file_name = f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    
+    def build(path):
+        if report in SHARED_REPORTS:
+            content = shared_view(f"report_{report}", lambda: report_bytes(data_manager, report))
+            with open(path, 'wb') as f:
+                f.write(content)
+        else:
+            write_report(data_manager, report, path)
+    
+    prepared_download(report, label, file_name, "text/csv", build)
+
+def report_summary():
+    """Points total, level counts and level chart data for the reports page"""
+    def compute():
+        level_counts = data_manager.get_level_distribution()
+        import pandas as pd
+        level_df = pd.DataFrame([
+            {'سطح': f'سطح {level}', 'تعداد': count}
+            for level, count in sorted(level_counts.items())
+        ])
+        return {
+            'total_points': sum(m.get('points', 0) for m in data_manager.iter_members()),
+            'max_level': max(level_counts) if level_counts else 0,
+            'level_df': level_df.set_index('سطح')
+        }
+    
+    return shared_view("report_summary", compute)
 
 def reports_and_backup_page():
     """Reports and backup page"""
@@ -579,72 +852,27 @@ def reports_and_backup_page():
     # Export section
     st.subheader("📥 خروجی گزارش‌ها")
     
-    members = data_manager.get_all_members()
+    member_count = data_manager.get_member_count()
     
-    if not members:
+    if not member_count:
         st.info("هیچ داده‌ای برای خروجی گرفتن وجود ندارد.")
     else:
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         
         with col1:
             st.write("**📋 خروجی اطلاعات اعضا (CSV)**")
-            st.write(f"تعداد اعضا: {len(members)}")
-            
-            # Prepare data for CSV
-            export_data = []
-            for member in members:
-                level, _, _ = get_level_info(member.get('points', 0))
-                export_data.append({
-                    'نام': member['first_name'],
-                    'نام خانوادگی': member['last_name'],
-                    'تاریخ تولد': member.get('birth_date', ''),
-                    'مسئولیت': member.get('responsibility', ''),
-                    'توضیحات': member.get('description', ''),
-                    'امتیاز': member.get('points', 0),
-                    'سطح': level
-                })
-            
-            df = pd.DataFrame(export_data)
-            csv = df.to_csv(index=False, encoding='utf-8-sig')
-            
-            st.download_button(
-                label="💾 دانلود فایل CSV",
-                data=csv,
-                file_name=f"members_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                type="primary"
-            )
+            st.write(f"تعداد اعضا: {member_count}")
+            report_download('members', "💾 دانلود فایل CSV", "members_report")
         
         with col2:
             st.write("**📈 خروجی گزارش امتیازات**")
-            st.write(f"مجموع امتیازات همه اعضا: {sum(m.get('points', 0) for m in members)}")
-            
-            # Prepare scoring report
-            scoring_data = []
-            for i, member in enumerate(sorted(members, key=lambda x: x.get('points', 0), reverse=True)):
-                level, _, _ = get_level_info(member.get('points', 0))
-                badges = get_achievement_badges(level)
-                badge_names = ', '.join([b['name'] for b in badges]) if badges else 'ندارد'
-                
-                scoring_data.append({
-                    'رتبه': i + 1,
-                    'نام و نام خانوادگی': f"{member['first_name']} {member['last_name']}",
-                    'امتیاز': member.get('points', 0),
-                    'سطح': level,
-                    'نشان‌ها': badge_names,
-                    'تعداد تغییرات': len(member.get('points_history', []))
-                })
-            
-            df = pd.DataFrame(scoring_data)
-            csv = df.to_csv(index=False, encoding='utf-8-sig')
-            
-            st.download_button(
-                label="💾 دانلود گزارش امتیازات",
-                data=csv,
-                file_name=f"scoring_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                type="primary"
-            )
+            st.write(f"مجموع امتیازات همه اعضا: {report_summary()['total_points']}")
+            report_download('scoring', "💾 دانلود گزارش امتیازات", "scoring_report")
+        
+        with col3:
+            st.write("**📜 خروجی تاریخچه امتیازات**")
+            st.write("تمام تغییرات امتیاز همه اعضا")
+            report_download('history', "💾 دانلود تاریخچه امتیازات", "points_history_report")
     
     st.divider()
     
@@ -657,19 +885,21 @@ def reports_and_backup_page():
         st.write("**📦 ایجاد پشتیبان**")
         st.write("ایجاد یک نسخه پشتیبان از تمام داده‌های سیستم")
         
-        # Prepare backup data directly for download
+        # The backup is streamed to a temporary file only when requested
         backup_filename = f"members_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        backup_content = json.dumps(data_manager.get_all_members(), ensure_ascii=False, indent=2)
-        
-        st.download_button(
-            label="💾 دانلود فایل پشتیبان",
-            data=backup_content,
-            file_name=backup_filename,
-            mime="application/json",
-            type="primary"
-        )
+        prepared_download("backup", "💾 دانلود فایل پشتیبان", backup_filename, "application/json",
+                          data_manager.backup_data)
         
         st.info("💡 فایل پشتیبان شامل تمام اطلاعات اعضا، امتیازات و تاریخچه است.")
+        
+        if backup_scheduler:
+            auto_backups = backup_scheduler.backups()
+            st.caption(
+                f"🕒 پشتیبان خودکار هر {backup_scheduler.interval / 60:g} دقیقه در «{backup_scheduler.directory}» "
+                f"({len(auto_backups)} نسخه، حداکثر {backup_scheduler.keep})"
+            )
+            if backup_scheduler.last_error:
+                st.warning(f"⚠️ آخرین پشتیبان خودکار ناموفق بود: {backup_scheduler.last_error}")
     
     with col2:
         st.write("**♻️ بازیابی از پشتیبان**")
@@ -685,56 +915,82 @@ def reports_and_backup_page():
             st.warning("⚠️ توجه: بازیابی از پشتیبان، تمام داده‌های فعلی را جایگزین می‌کند!")
             
             if st.button("بازیابی داده‌ها", type="secondary"):
-                # Save uploaded file temporarily
-                temp_backup = "temp_restore_backup.json"
-                with open(temp_backup, 'wb') as f:
-                    f.write(uploaded_backup.getbuffer())
+                # Parse the upload incrementally; members are validated as they are read
+                progress_bar = st.progress(0.0, text="در حال بازیابی...")
+                total_bytes = max(uploaded_backup.size, 1)
+                
+                def report_progress(count):
+                    if count % 100 == 0:
+                        fraction = min(uploaded_backup.tell() / total_bytes, 1.0)
+                        progress_bar.progress(fraction, text=f"{count} عضو خوانده شد")
+                
+                uploaded_backup.seek(0)
+                backup_text = io.TextIOWrapper(uploaded_backup, encoding='utf-8-sig')
+                try:
+                    restored = data_manager.restore_from(backup_text, report_progress)
+                finally:
+                    backup_text.detach()
                 
-                if data_manager.restore_data(temp_backup):
+                if restored:
+                    progress_bar.progress(1.0, text="بازیابی کامل شد")
+                    st.success("✅ داده‌ها با موفقیت بازیابی شد!")
+                    st.rerun()
+                else:
+                    progress_bar.empty()
+                    st.error("❌ خطا در بازیابی داده‌ها!")
+    
+    with st.expander("🗂️ پشتیبان‌گیری افزایشی"):
+        st.write("هر نقطه پشتیبان فقط تغییرات نسبت به نقطه قبلی را ذخیره می‌کند؛ هر چند نقطه یک نسخه کامل گرفته می‌شود.")
+        
+        if st.button("➕ ایجاد نقطه پشتیبان", key="incremental_backup"):
+            point_file = data_manager.backup_incremental()
+            if point_file:
+                st.success(f"✅ نقطه پشتیبان ذخیره شد: {point_file}")
+            else:
+                st.error("❌ خطا در ایجاد نقطه پشتیبان!")
+        
+        backup_points = data_manager.list_backup_points()
+        if backup_points:
+            kind_labels = {'base': 'کامل', 'delta': 'تغییرات'}
+            point_index = st.selectbox(
+                "بازگردانی به نقطه",
+                options=range(len(backup_points)),
+                index=len(backup_points) - 1,
+                format_func=lambda i: f"{backup_points[i]['created']} ({kind_labels[backup_points[i]['kind']]}، {backup_points[i]['members']} عضو)",
+                key="backup_point"
+            )
+            if st.button("بازیابی این نقطه", type="secondary", key="restore_backup_point"):
+                if data_manager.restore_backup_point(point_index):
                     st.success("✅ داده‌ها با موفقیت بازیابی شد!")
-                    os.remove(temp_backup)
                     st.rerun()
                 else:
                     st.error("❌ خطا در بازیابی داده‌ها!")
-                    if os.path.exists(temp_backup):
-                        os.remove(temp_backup)
     
     st.divider()
     
     # Statistics section
     st.subheader("📊 آمار کلی")
     
-    if members:
+    if member_count:
+        summary = report_summary()
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("تعداد کل اعضا", len(members))
+            st.metric("تعداد کل اعضا", member_count)
         
         with col2:
-            total_points = sum(m.get('points', 0) for m in members)
-            st.metric("مجموع امتیازات", total_points)
+            st.metric("مجموع امتیازات", summary['total_points'])
         
         with col3:
-            avg_points = total_points / len(members) if members else 0
+            avg_points = summary['total_points'] / member_count
             st.metric("میانگین امتیازات", f"{avg_points:.1f}")
         
         with col4:
-            max_level = max([get_level_info(m.get('points', 0))[0] for m in members])
-            st.metric("بالاترین سطح", max_level)
+            st.metric("بالاترین سطح", summary['max_level'])
         
         # Level distribution chart
         st.write("**📈 توزیع اعضا بر اساس سطح**")
-        level_counts = {}
-        for member in members:
-            level, _, _ = get_level_info(member.get('points', 0))
-            level_counts[level] = level_counts.get(level, 0) + 1
-        
-        level_df = pd.DataFrame([
-            {'سطح': f'سطح {level}', 'تعداد': count}
-            for level, count in sorted(level_counts.items())
-        ])
-        
-        st.bar_chart(level_df.set_index('سطح'))
+        st.bar_chart(summary['level_df'])
     
     st.markdown('</div>', unsafe_allow_html=True)
 
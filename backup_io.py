@@ -0,0 +1,126 @@
+import json
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO
+
+# Characters read from a backup per step while parsing
+READ_CHUNK = 1 << 20
+
+_WHITESPACE = ' \t\r\n\ufeff'
+
+# A decode error this close to the end of the buffer may just be a record cut
+# off mid-token (``tru``, ``\u00``); further away it is a real syntax error
+_TRUNCATION_MARGIN = 6
+
+
+class BackupError(ValueError):
+    """A backup file that is not a list of valid member records"""
+
+
+def validate_member_record(record, position: int) -> Dict:
+    """Check one member record read from a backup, return it unchanged"""
+    if not isinstance(record, dict):
+        raise BackupError(f"Member {position}: expected an object")
+    for field in ('first_name', 'last_name'):
+        if not isinstance(record.get(field), str):
+            raise BackupError(f"Member {position}: '{field}' must be text")
+    points = record.get('points', 0)
+    if isinstance(points, bool) or not isinstance(points, int) or points < 0:
+        raise BackupError(f"Member {position}: 'points' must be a non-negative whole number")
+    if 'id' in record and not isinstance(record['id'], str):
+        raise BackupError(f"Member {position}: 'id' must be text")
+    history = record.get('points_history', [])
+    if not isinstance(history, list) or not all(isinstance(entry, dict) for entry in history):
+        raise BackupError(f"Member {position}: 'points_history' must be a list of entries")
+    return record
+
+
+def iter_backup_records(f: TextIO, progress: Optional[Callable[[int], None]] = None,
+                        chunk_size: int = READ_CHUNK) -> Iterator[Dict]:
+    """Yield the validated member records of a backup (a JSON list) one at a time
+
+    Only the record being decoded is held in memory, so memory use is bounded
+    by the largest member rather than the size of the whole backup. ``progress``
+    is called with the number of records read so far after each one.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def fill(buffer, pos, at_least):
+        # Drop what has been consumed and read more; returns (buffer, pos, eof)
+        more = f.read(max(chunk_size, at_least))
+        return buffer[pos:] + more, 0, not more
+
+    def skip_whitespace(buffer, pos, eof):
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer, pos, eof
+            buffer, pos, eof = fill(buffer, pos, 0)
+
+    buffer, pos, eof = skip_whitespace(buffer, pos, eof)
+    if buffer[pos:pos + 1] != '[':
+        raise BackupError("Backup must be a JSON list of members")
+    pos += 1
+
+    count = 0
+    expect_record = True
+    while True:
+        buffer, pos, eof = skip_whitespace(buffer, pos, eof)
+        if pos >= len(buffer):
+            raise BackupError("Backup ended before the closing ']'")
+
+        char = buffer[pos]
+        if char == ']':
+            if expect_record and count:
+                raise BackupError(f"Member {count + 1}: expected a member after ','")
+            return
+        if not expect_record:
+            if char != ',':
+                raise BackupError(f"Member {count + 1}: expected ',' or ']'")
+            pos += 1
+            expect_record = True
+            continue
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            cut_off = e.msg.startswith("Unterminated string") or e.pos >= len(buffer) - _TRUNCATION_MARGIN
+            if eof or not cut_off:
+                # Reading on would only pull the rest of a broken file into memory
+                raise BackupError(f"Member {count + 1}: invalid JSON ({e.msg})")
+            # Probably cut off mid-record: read at least as much again and retry
+            buffer, pos, eof = fill(buffer, pos, len(buffer) - pos)
+            continue
+
+        count += 1
+        yield validate_member_record(record, count)
+        if progress:
+            progress(count)
+        pos = end
+        expect_record = False
+        if pos >= chunk_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def write_backup(f: TextIO, members: Iterable[Dict],
+                 history_for: Callable[[str], Iterable[Dict]]) -> int:
+    """Write members, each with its history inline as ``points_history``, as a JSON list
+
+    One member is written at a time and its history is streamed entry by
+    entry, so memory stays bounded however long the history is. Returns the
+    number of members written.
+    """
+    count = 0
+    f.write('[')
+    for member in members:
+        record = {k: v for k, v in member.items() if k != 'points_history'}
+        body = json.dumps(record, ensure_ascii=False)
+        f.write(',\n  ' if count else '\n  ')
+        f.write(body[:-1])
+        f.write(', "points_history": [')
+        for i, entry in enumerate(history_for(record['id'])):
+            f.write((', ' if i else '') + json.dumps(entry, ensure_ascii=False))
+        f.write(']}')
+        count += 1
+    f.write('\n]\n' if count else ']\n')
+    return count
@@ -0,0 +1,154 @@
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+# Defaults, overridable through MASJED_BACKUP_* environment variables
+DEFAULT_BACKUP_DIR = "backups/auto"
+DEFAULT_INTERVAL_MINUTES = 60
+DEFAULT_KEEP = 24
+
+BACKUP_PATTERN = "members_backup_*.json"
+
+
+class BackupScheduler:
+    """Background thread writing rotating full backups with DataManager.backup_data
+
+    A backup is written every ``interval`` seconds into ``directory``; after
+    each one only the newest ``keep`` files are kept, and files older than
+    ``max_age_days`` (when set) are removed too. The thread only reads the
+    data, so user reruns are never held up while a backup is serialized.
+    """
+
+    def __init__(self, data_manager, directory: str = DEFAULT_BACKUP_DIR,
+                 interval: float = DEFAULT_INTERVAL_MINUTES * 60, keep: int = DEFAULT_KEEP,
+                 max_age_days: Optional[float] = None):
+        if interval <= 0:
+            raise ValueError("Backup interval must be positive")
+        self.data_manager = data_manager
+        self.directory = directory
+        self.interval = interval
+        self.keep = max(1, keep)
+        self.max_age_days = max_age_days
+        self.last_backup: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def backups(self) -> List[str]:
+        """Backup files in the directory, oldest first"""
+        return sorted(glob.glob(os.path.join(self.directory, BACKUP_PATTERN)))
+
+    def _seconds_until_due(self) -> float:
+        """Time left before the next backup, based on the newest existing one"""
+        existing = self.backups()
+        if not existing:
+            return 0
+        age = time.time() - os.path.getmtime(existing[-1])
+        return max(0.0, self.interval - age)
+
+    def run_once(self) -> Optional[str]:
+        """Write one backup and apply the retention policy, return the backup path"""
+        os.makedirs(self.directory, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"members_backup_{timestamp}.json")
+        if not self.data_manager.backup_data(path):
+            self.last_error = f"Backup to {path} failed"
+            return None
+        self.last_backup = path
+        self.last_error = None
+        self.prune()
+        return path
+
+    def prune(self) -> List[str]:
+        """Remove backups beyond the retention policy, return the removed paths"""
+        existing = self.backups()
+        expired = existing[:-self.keep]
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            # Always keep the newest backup, however old
+            expired += [path for path in existing[-self.keep:-1] if os.path.getmtime(path) < cutoff]
+        removed = []
+        for path in expired:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError as e:
+                print(f"Error removing old backup: {e}")
+        return removed
+
+    def _run(self):
+        wait = self._seconds_until_due()
+        while not self._stop.wait(wait):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error in scheduled backup: {e}")
+            wait = self.interval
+
+    def start(self):
+        """Start the background thread (no-op when already running)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="masjed-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+
+_scheduler: Optional[BackupScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def start_backup_scheduler(data_manager_factory: Callable[[], object]) -> Optional[BackupScheduler]:
+    """Start the process-wide backup scheduler once, configured from the environment
+
+    The scheduler thread backs up through the manager returned by
+    ``data_manager_factory`` (called only when the scheduler is actually
+    started); with ``create_data_manager`` that is the process-wide shared
+    manager the sessions use as well. Settings come from ``MASJED_BACKUP_INTERVAL``
+    (minutes, 0 disables), ``MASJED_BACKUP_DIR``, ``MASJED_BACKUP_KEEP`` and
+    ``MASJED_BACKUP_MAX_AGE_DAYS``. Later calls
+    (every Streamlit session and rerun) return the scheduler already running.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return _scheduler
+        try:
+            interval = float(os.environ.get("MASJED_BACKUP_INTERVAL", DEFAULT_INTERVAL_MINUTES))
+            keep = int(os.environ.get("MASJED_BACKUP_KEEP", DEFAULT_KEEP))
+            max_age = os.environ.get("MASJED_BACKUP_MAX_AGE_DAYS")
+            max_age_days = float(max_age) if max_age else None
+        except ValueError as e:
+            print(f"Error in backup scheduler settings: {e}")
+            return None
+        if interval <= 0:
+            return None
+
+        _scheduler = BackupScheduler(
+            data_manager_factory(),
+            directory=os.environ.get("MASJED_BACKUP_DIR", DEFAULT_BACKUP_DIR),
+            interval=interval * 60,
+            keep=keep,
+            max_age_days=max_age_days
+        )
+        _scheduler.start()
+        return _scheduler
+
+
+def get_backup_scheduler() -> Optional[BackupScheduler]:
+    """The process-wide scheduler, if one was started"""
+    return _scheduler
@@ -0,0 +1,10 @@
+"""Benchmarks for the member store and the app pages on synthetic rosters
+
+    python -m benchmarks --sizes 100 1000 10000 100000 --history 20 --output results.json
+    python -m benchmarks --pages --startup --compare results.json
+    python -m benchmarks --sizes 1000 --checkin 300
+
+Results are written as JSON (one entry per backend, roster size and
+operation, with median and fastest wall time) tagged with the git commit,
+so runs on different commits can be compared with ``--compare``.
+"""
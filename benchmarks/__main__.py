@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The benchmarks chdir into scratch directories; keep the app modules importable
+sys.path.insert(0, REPO_ROOT)
+
+from data_manager import STORAGE_BACKENDS
+
+from benchmarks.checkin_bench import bench_checkin
+from benchmarks.data_bench import bench_data_manager
+from benchmarks.datasets import write_dataset
+from benchmarks.page_bench import bench_pages
+from benchmarks.startup_bench import bench_startup
+
+
+def git_commit() -> Optional[str]:
+    """Commit the benchmarked tree is at, if it is a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result: Dict) -> tuple:
+    return (result['backend'], result['members'], result['operation'])
+
+
+def compare(results: List[Dict], baseline_file: str):
+    """Print each operation's median against the same one in a previous results file"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+    print(f"{'backend':8} {'members':>8} {'operation':32} {'before':>10} {'after':>10} {'ratio':>7}", file=sys.stderr)
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None:
+            continue
+        ratio = result['median_s'] / before['median_s'] if before['median_s'] else float('inf')
+        print(f"{result['backend']:8} {result['members']:>8} {result['operation']:32} "
+              f"{before['median_s'] * 1000:>8.2f}ms {result['median_s'] * 1000:>8.2f}ms {ratio:>6.2f}x", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Time DataManager operations and app pages on synthetic rosters")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="roster sizes (members)")
+    parser.add_argument("--history", type=int, default=10, help="points history entries per member")
+    parser.add_argument("--backends", nargs="+", choices=STORAGE_BACKENDS, default=list(STORAGE_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per operation")
+    parser.add_argument("--pages", action="store_true", help="also time headless reruns of the app pages")
+    parser.add_argument("--startup", action="store_true",
+                        help="also time cold starts (import, store open, first paint) in fresh interpreters")
+    parser.add_argument("--checkin", type=int, metavar="SCANS", default=0,
+                        help="also time a burst of this many check-in scans through the ingestion queue")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file of an earlier run to compare with")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Scheduled backups would compete with the timed work
+    os.environ["MASJED_BACKUP_INTERVAL"] = "0"
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="masjed-bench-") as workdir:
+        try:
+            for size in args.sizes:
+                dataset_file = os.path.join(workdir, f"dataset_{size}.json")
+                history = write_dataset(dataset_file, size, args.history, args.seed)
+                for backend in args.backends:
+                    store_dir = os.path.join(workdir, f"{backend}_{size}")
+                    os.makedirs(store_dir)
+                    os.chdir(store_dir)
+                    os.environ["MASJED_STORAGE"] = backend
+                    print(f"{backend}: {size} members, {history} history entries", file=sys.stderr)
+
+                    runs = bench_data_manager(backend, dataset_file, size, args.repeat, args.seed)
+                    if args.pages:
+                        runs += [dict(run, suite='pages') for run in bench_pages(args.repeat)]
+                    if args.startup:
+                        runs += [dict(run, suite='startup') for run in bench_startup(args.repeat)]
+                    if args.checkin:
+                        runs += [dict(run, suite='checkin')
+                                 for run in bench_checkin(backend, size, args.checkin, seed=args.seed)]
+                    for run in runs:
+                        run.setdefault('suite', 'data')
+                        results.append(dict(backend=backend, members=size, history=history, **run))
+                        print(f"  {run['operation']:32} {run['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': vars(args),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
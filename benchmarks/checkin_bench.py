@@ -0,0 +1,87 @@
+import json
+import random
+import threading
+import time
+import urllib.request
+from typing import Dict, List
+
+from checkin import CheckInQueue, make_http_server
+from data_manager import create_data_manager
+
+from benchmarks.datasets import member_id_for
+
+
+def post_scans(url: str, member_ids: List[str], session: str):
+    """Send scans one request each, as a scanner at the door would"""
+    for member_id in member_ids:
+        body = json.dumps({'member': member_id, 'session': session}).encode('utf-8')
+        request = urllib.request.Request(url, body, {'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            response.read()
+
+
+def bench_checkin(backend: str, members: int, scans: int = 300, scanners: int = 4,
+                  repeat_ratio: float = 0.2, seed: int = 0) -> List[Dict]:
+    """Time a burst of check-ins through the HTTP endpoint against the store in the current directory
+
+    ``scanners`` threads post ``scans`` scans in total to a local endpoint,
+    ``repeat_ratio`` of them repeats of a member already scanned, and the
+    time until every check-in is written is measured. For comparison the
+    same number of check-ins is also applied one ``update_member_points_by_id``
+    call each. Results carry the queue's throughput and latency figures.
+    """
+    rng = random.Random(seed)
+    unique = [member_id_for(i) for i in rng.sample(range(members), min(members, int(scans * (1 - repeat_ratio))))]
+    burst = unique + [rng.choice(unique) for _ in range(scans - len(unique))]
+    rng.shuffle(burst)
+
+    checkin_queue = CheckInQueue(create_data_manager(backend), batch_window=0.05)
+    checkin_queue.start()
+    server = make_http_server(checkin_queue, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/checkin"
+    session = f"bench-{time.time()}"
+    try:
+        start = time.perf_counter()
+        threads = [threading.Thread(target=post_scans, args=(url, burst[i::scanners], session))
+                   for i in range(scanners)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        checkin_queue.drain()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+        checkin_queue.stop()
+    metrics = checkin_queue.metrics()
+    results = [{
+        'operation': 'checkin_burst_queued',
+        'runs': 1,
+        'median_s': elapsed,
+        'min_s': elapsed,
+        'scans': scans,
+        'applied': metrics['applied'],
+        'duplicates': metrics['duplicates'],
+        'batches': metrics['batches'],
+        'throughput_per_s': metrics['applied'] / elapsed if elapsed else None,
+        'latency_s': metrics.get('latency_s')
+    }]
+
+    data_manager = create_data_manager(backend)
+    start = time.perf_counter()
+    for member_id in unique:
+        member = data_manager.get_member_by_id(member_id)
+        data_manager.update_member_points_by_id(member_id, member['points'] + 1, "حضور")
+    elapsed = time.perf_counter() - start
+    data_manager.flush()
+    results.append({
+        'operation': 'checkin_burst_per_scan',
+        'runs': 1,
+        'median_s': elapsed,
+        'min_s': elapsed,
+        'scans': len(unique),
+        'throughput_per_s': len(unique) / elapsed if elapsed else None
+    })
+    return results
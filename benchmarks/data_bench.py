@@ -0,0 +1,80 @@
+import os
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from data_manager import create_data_manager
+from exports import REPORTS, write_report
+
+from benchmarks.datasets import member_id_for
+
+
+def time_call(fn: Callable, runs: int) -> Dict:
+    """Run ``fn`` ``runs`` times, return the run count and the median and fastest wall time"""
+    timings = []
+    for _ in range(max(1, runs)):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {'runs': len(timings), 'median_s': statistics.median(timings), 'min_s': min(timings)}
+
+
+def bench_data_manager(backend: str, dataset_file: str, members: int, repeat: int = 5,
+                       seed: int = 0) -> List[Dict]:
+    """Time the DataManager operations on one backend, in the current directory
+
+    The store is filled by restoring ``dataset_file`` (that restore is itself
+    timed), then every operation the pages rely on is timed ``repeat`` times
+    on one warm, shared manager. ``open`` and ``load`` use fresh private
+    managers: ``load`` is the cold parse a new process pays on first read.
+    Returns one result per operation.
+    """
+    results = []
+    rng = random.Random(seed)
+
+    def record(operation, fn, runs=repeat):
+        timing = time_call(fn, runs)
+        results.append(dict(operation=operation, **timing))
+
+    data_manager = create_data_manager(backend)
+    record('restore', lambda: data_manager.restore_data(dataset_file), runs=1)
+    record('open', lambda: create_data_manager(backend, shared=False), runs=min(repeat, 3))
+    # The constructor reads nothing; this is what a cold manager pays for its first read
+    record('load', lambda: create_data_manager(backend, shared=False).get_member_count(), runs=min(repeat, 3))
+
+    def some_id():
+        return member_id_for(rng.randrange(members))
+
+    record('get_all_members', data_manager.get_all_members)
+    record('get_member_count', data_manager.get_member_count)
+    record('get_member_by_id', lambda: data_manager.get_member_by_id(some_id()))
+    record('query_members_page', lambda: data_manager.query_members(sort_by='name', limit=25))
+    record('query_members_search', lambda: data_manager.query_members(search="محمد", limit=25))
+    record('get_member_history_page', lambda: data_manager.get_member_history_by_id(some_id(), 0, 20))
+    record('get_member_history_count', lambda: data_manager.get_member_history_count_by_id(some_id()))
+    record('get_leaderboard_top10', lambda: data_manager.get_leaderboard(10))
+    record('get_leaderboard_all', data_manager.get_leaderboard)
+    record('get_member_rank', lambda: data_manager.get_member_rank(some_id()))
+    record('get_member_progress', lambda: data_manager.get_member_progress(some_id()))
+    record('get_level_distribution', data_manager.get_level_distribution)
+
+    def award_one():
+        member_id = some_id()
+        member = data_manager.get_member_by_id(member_id)
+        data_manager.update_member_points_by_id(member_id, member['points'] + 1, "حضور در نماز جماعت")
+
+    record('update_member_points', award_one)
+    record('apply_points_batch_10',
+           lambda: data_manager.apply_points_batch([(some_id(), 1, "کلاس قرآن") for _ in range(10)]))
+
+    record('backup', lambda: data_manager.backup_data("bench_backup.json"), runs=min(repeat, 3))
+    for report in REPORTS:
+        record(f'export_{report}_csv', lambda report=report: write_report(data_manager, report, f"bench_{report}.csv"),
+               runs=min(repeat, 3))
+
+    data_manager.flush()
+    for file_name in ["bench_backup.json"] + [f"bench_{report}.csv" for report in REPORTS]:
+        if os.path.exists(file_name):
+            os.remove(file_name)
+    return results
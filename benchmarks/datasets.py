@@ -0,0 +1,92 @@
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from backup_io import write_backup
+
+FIRST_NAMES = [
+    "محمد", "علی", "حسین", "حسن", "رضا", "مهدی", "امیر", "جواد", "مصطفی", "سجاد",
+    "ابوالفضل", "یوسف", "عباس", "محسن", "فاطمه", "زهرا", "مریم", "زینب", "معصومه",
+    "سکینه", "نرگس", "رقیه", "کوثر", "ریحانه",
+]
+
+LAST_NAMES = [
+    "محمدی", "حسینی", "احمدی", "رضایی", "موسوی", "کریمی", "هاشمی", "جعفری", "صادقی",
+    "رحیمی", "نوری", "طاهری", "قاسمی", "فاطمی", "کاظمی", "باقری", "اکبری", "عباسی",
+]
+
+RESPONSIBILITIES = ["", "", "", "مکبر", "خادم", "مؤذن", "کتابدار", "مسئول فرهنگی", "هیئت امنا"]
+
+REASONS = ["حضور در نماز جماعت", "شرکت در کلاس قرآن", "کمک در برگزاری مراسم", "حفظ سوره", "تنظیم دستی"]
+
+DESCRIPTIONS = ["", "", "عضو فعال", "عضو گروه نوجوانان", "شرکت‌کننده در اعتکاف"]
+
+
+def member_id_for(number: int) -> str:
+    """Deterministic member id, so runs at the same size touch the same members"""
+    return f"{number:032x}"
+
+
+def generate_members(count: int, seed: int = 0) -> Iterator[Dict]:
+    """Synthetic member records (without history) with Persian names"""
+    rng = random.Random(seed)
+    for number in range(count):
+        year = rng.randint(1330, 1395)
+        yield {
+            'id': member_id_for(number),
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+            'birth_date': f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'responsibility': rng.choice(RESPONSIBILITIES),
+            'description': rng.choice(DESCRIPTIONS),
+            'points': 0,
+            'photo_path': None
+        }
+
+
+def generate_history(member_id: str, entries: int, seed: int = 0) -> List[Dict]:
+    """Synthetic points history for one member, oldest first"""
+    rng = random.Random(f"{seed}:{member_id}")
+    moment = datetime(2023, 1, 1)
+    points = 0
+    history = []
+    for _ in range(entries):
+        moment += timedelta(hours=rng.randint(1, 72))
+        change = rng.choice((1, 1, 2, 5, 10, -1))
+        new_points = max(0, points + change)
+        history.append({
+            'timestamp': moment.strftime("%Y-%m-%d %H:%M:%S"),
+            'old_points': points,
+            'new_points': new_points,
+            'change': new_points - points,
+            'reason': rng.choice(REASONS)
+        })
+        points = new_points
+    return history
+
+
+def write_dataset(backup_file: str, members: int, history_per_member: int, seed: int = 0) -> int:
+    """Write a synthetic roster as a backup file (members with inline history), return its history size
+
+    Points equal the sum of each member's history, as in real data. Restore
+    the file with ``DataManager.restore_data`` to fill any backend.
+    """
+    histories = {}
+    total = 0
+
+    def members_with_points():
+        nonlocal total
+        for member in generate_members(members, seed):
+            history = generate_history(member['id'], history_per_member, seed)
+            member['points'] = history[-1]['new_points'] if history else 0
+            histories[member['id']] = history
+            total += len(history)
+            yield member
+
+    directory = os.path.dirname(backup_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(backup_file, 'w', encoding='utf-8') as f:
+        write_backup(f, members_with_points(), lambda member_id: histories.pop(member_id, []))
+    return total
@@ -0,0 +1,58 @@
+import os
+import statistics
+import time
+from typing import Dict, List
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Page function -> its label in the sidebar selectbox
+PAGES = {
+    'member_management_page': "مدیریت اعضا",
+    'scoring_page': "امتیازدهی",
+    'reports_and_backup_page': "گزارش‌ها و پشتیبان",
+}
+
+
+def bench_pages(reruns: int = 5, timeout: float = 300) -> List[Dict]:
+    """Time headless runs of each page of app.py against the store in the current directory
+
+    Uses Streamlit's AppTest, so the whole script (data manager setup
+    included) runs as it does for a browser session. For each page the run
+    that navigates to it and ``reruns`` plain reruns after it are timed.
+    Returns one result per page, or an empty list when Streamlit is missing.
+    """
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("Streamlit is not installed; skipping page benchmarks")
+        return []
+
+    app = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    start = time.perf_counter()
+    app.run()
+    first_run = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(f"app.py failed: {app.exception[0].value}")
+
+    results = []
+    for page, label in PAGES.items():
+        start = time.perf_counter()
+        app.sidebar.selectbox[0].set_value(label).run()
+        navigate = time.perf_counter() - start
+        if app.exception:
+            raise RuntimeError(f"{page} failed: {app.exception[0].value}")
+
+        timings = []
+        for _ in range(max(1, reruns)):
+            start = time.perf_counter()
+            app.run()
+            timings.append(time.perf_counter() - start)
+        results.append({
+            'operation': f'page_{page}',
+            'runs': len(timings),
+            'median_s': statistics.median(timings),
+            'min_s': min(timings),
+            'navigate_s': navigate,
+            'first_run_s': first_run
+        })
+    return results
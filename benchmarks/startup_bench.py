@@ -0,0 +1,68 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from benchmarks.page_bench import APP_FILE
+
+REPO_ROOT = os.path.dirname(APP_FILE)
+
+# Run in a fresh interpreter per sample, so nothing is already imported or cached
+STARTUP_SCRIPT = r"""
+import json, sys, time
+start = time.perf_counter()
+result = {}
+import data_manager
+result['import_data_manager'] = time.perf_counter() - start
+store = data_manager.create_data_manager()
+result['open_store'] = time.perf_counter() - start
+store.get_member_count()
+result['first_read'] = time.perf_counter() - start
+try:
+    from streamlit.testing.v1 import AppTest
+except ImportError:
+    AppTest = None
+if AppTest is not None:
+    result['import_streamlit'] = time.perf_counter() - start
+    app = AppTest.from_file(sys.argv[1], default_timeout=300)
+    app.run()
+    result['first_paint'] = time.perf_counter() - start
+    result['pandas_loaded'] = 'pandas' in sys.modules
+print(json.dumps(result))
+"""
+
+
+def bench_startup(runs: int = 3) -> List[Dict]:
+    """Time a cold start against the store in the current directory
+
+    Each sample is a new interpreter that imports ``data_manager``, opens
+    the store, reads it once and, with Streamlit installed, renders the
+    first page of app.py headlessly. Times are cumulative from the first
+    import, so ``startup_first_paint`` is what a freshly started container
+    needs before it can serve the first page. The first-paint result also
+    says whether pandas had to be imported for it.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+    samples = []
+    for _ in range(max(1, runs)):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, APP_FILE], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = []
+    for step in ('import_data_manager', 'open_store', 'first_read', 'import_streamlit', 'first_paint'):
+        timings = [sample[step] for sample in samples if step in sample]
+        if not timings:
+            continue
+        result = {
+            'operation': f'startup_{step}',
+            'runs': len(timings),
+            'median_s': statistics.median(timings),
+            'min_s': min(timings)
+        }
+        if step == 'first_paint':
+            result['pandas_loaded'] = any(sample['pandas_loaded'] for sample in samples)
+        results.append(result)
+    return results
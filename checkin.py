@@ -0,0 +1,419 @@
+"""Attendance check-in ingestion: scans are queued and applied to the store in batches
+
+At prayer time many members check in within a minute. Instead of one
+full write per scan, scans are queued, repeated scans of a member in the
+same session are dropped, and a single worker thread applies what is
+queued with one ``apply_points_batch`` write per batch.
+
+Scans arrive over a local HTTP endpoint and/or a watched drop folder:
+
+    python checkin.py --port 8765 --drop-dir scans --points 1 --reason "حضور در نماز"
+
+    curl -X POST localhost:8765/checkin -d '{"member": "<member id>", "session": "maghrib"}'
+    curl localhost:8765/metrics
+
+A drop-folder file holds one scan per line, ``member id[,session]``; write
+it under a name starting with "." and rename it when complete. Read files
+are moved to ``processed/`` inside the folder.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import perf
+from data_manager import STORAGE_BACKENDS, create_data_manager
+
+DEFAULT_POINTS = 1
+DEFAULT_REASON = "حضور"
+DEFAULT_BATCH_SIZE = 200
+# Seconds the worker waits for more scans after the first one of a batch
+DEFAULT_BATCH_WINDOW = 0.5
+# Sessions whose scans are remembered for deduplication
+DEFAULT_KEEP_SESSIONS = 16
+# Recent scans whose latency (queued -> written) is kept for the metrics
+LATENCY_SAMPLES = 2000
+# Seconds of recent batches the throughput figure is computed over
+THROUGHPUT_WINDOW = 60
+
+
+def default_session() -> str:
+    """The session a scan belongs to when none is given: today's date"""
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+class CheckInQueue:
+    """Queue of check-in scans applied to a store by one background worker
+
+    ``submit`` is cheap and thread-safe: it drops a scan of a member already
+    seen in the same session and otherwise queues it. The worker takes up
+    to ``batch_size`` queued scans (waiting at most ``batch_window`` seconds
+    after the first for more to arrive), drops scans of unknown members and
+    awards ``points`` to the rest with a single ``apply_points_batch`` call,
+    so a burst of scans costs a few writes instead of one each. A batch
+    that fails to save is retried with the next one.
+    """
+
+    def __init__(self, data_manager, points: int = DEFAULT_POINTS, reason: str = DEFAULT_REASON,
+                 batch_size: int = DEFAULT_BATCH_SIZE, batch_window: float = DEFAULT_BATCH_WINDOW,
+                 keep_sessions: int = DEFAULT_KEEP_SESSIONS):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.data_manager = data_manager
+        self.points = points
+        self.reason = reason
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.keep_sessions = max(1, keep_sessions)
+        self.last_error: Optional[str] = None
+
+        # (member id, session, time queued)
+        self._pending: deque = deque()
+        self._in_flight = 0
+        self._seen: "OrderedDict[str, set]" = OrderedDict()
+        self._known_ids: set = set()
+        self._known_key = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._started = time.perf_counter()
+        self._latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._counts = {'received': 0, 'duplicates': 0, 'unknown': 0, 'applied': 0,
+                        'batches': 0, 'failed_batches': 0}
+        # (time written, check-ins written, when the oldest of them was queued) per recent batch
+        self._recent_batches: deque = deque()
+
+    def submit(self, member_id: str, session: Optional[str] = None) -> bool:
+        """Queue a scan, return False if the member already checked in this session"""
+        session = session or default_session()
+        with self._cond:
+            self._counts['received'] += 1
+            seen = self._seen.get(session)
+            if seen is None:
+                seen = self._seen[session] = set()
+                while len(self._seen) > self.keep_sessions:
+                    self._seen.popitem(last=False)
+            if member_id in seen:
+                self._counts['duplicates'] += 1
+                return False
+            seen.add(member_id)
+            self._pending.append((member_id, session, time.perf_counter()))
+            self._cond.notify()
+            return True
+
+    def submit_many(self, scans: Iterable[Tuple[str, Optional[str]]]) -> Tuple[int, int]:
+        """Queue (member id, session) scans, return (queued, duplicates)"""
+        queued = duplicates = 0
+        for member_id, session in scans:
+            if self.submit(member_id, session):
+                queued += 1
+            else:
+                duplicates += 1
+        return queued, duplicates
+
+    def _take_batch(self) -> List[tuple]:
+        """Wait for scans and take up to batch_size of them (empty when stopping)"""
+        with self._cond:
+            while not self._pending and not self._stop.is_set():
+                self._cond.wait(0.5)
+            if not self._pending:
+                return []
+            deadline = self._pending[0][2] + self.batch_window
+            while len(self._pending) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self._in_flight = len(batch)
+            return batch
+
+    def _member_ids(self) -> set:
+        """Ids of the stored members, re-read only when the data changed"""
+        key = self.data_manager.data_key()
+        if key != self._known_key:
+            self._known_ids = {member['id'] for member in self.data_manager.iter_members()}
+            self._known_key = key
+        return self._known_ids
+
+    def apply_batch(self, batch: List[tuple]) -> bool:
+        """Award the points for a batch of queued scans with one write"""
+        known = self._member_ids()
+        entries = [(member_id, self.points, f"{self.reason} ({session})")
+                   for member_id, session, _ in batch if member_id in known]
+        unknown = len(batch) - len(entries)
+
+        start = time.perf_counter()
+        if entries and not self.data_manager.apply_points_batch(entries):
+            with self._cond:
+                self._counts['failed_batches'] += 1
+                self.last_error = f"Saving a batch of {len(entries)} check-ins failed"
+            return False
+        done = time.perf_counter()
+        perf.observe("checkin.batch_write", done - start)
+        perf.observe("checkin.batch_size", len(entries), "count")
+
+        with self._cond:
+            self._counts['unknown'] += unknown
+            self._counts['applied'] += len(entries)
+            self._counts['batches'] += 1
+            if entries:
+                self._recent_batches.append((done, len(entries), min(queued for _, _, queued in batch)))
+            while self._recent_batches and self._recent_batches[0][0] < done - THROUGHPUT_WINDOW:
+                self._recent_batches.popleft()
+            for member_id, _, queued_at in batch:
+                if member_id in known:
+                    self._latencies.append(done - queued_at)
+                    perf.observe("checkin.latency", done - queued_at)
+            self.last_error = None
+        return True
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            try:
+                applied = self.apply_batch(batch)
+            except Exception as e:
+                applied = False
+                self.last_error = str(e)
+                print(f"Error applying check-ins: {e}")
+            with self._cond:
+                if not applied:
+                    # Keep the scans, in order, for the next attempt
+                    self._pending.extendleft(reversed(batch))
+                self._in_flight = 0
+                self._cond.notify_all()
+            if not applied and self._stop.wait(1):
+                return
+
+    def start(self):
+        """Start the worker thread (no-op when already running)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="masjed-checkin", daemon=True)
+        self._thread.start()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued scan has been written, return False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: Optional[float] = None):
+        """Write what is queued, stop the worker and flush the store"""
+        self.drain(timeout)
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        self.data_manager.flush()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def metrics(self) -> Dict:
+        """Counters, queue depth, throughput and latency of the written check-ins"""
+        with self._cond:
+            result = dict(self._counts)
+            result['queued'] = len(self._pending) + self._in_flight
+            latencies = sorted(self._latencies)
+            now = time.perf_counter()
+            recent = [batch for batch in self._recent_batches if batch[0] >= now - THROUGHPUT_WINDOW]
+            result['last_error'] = self.last_error
+        result['uptime_s'] = time.perf_counter() - self._started
+        result['avg_batch'] = result['applied'] / result['batches'] if result['batches'] else 0
+        # Check-ins written per second over the last THROUGHPUT_WINDOW seconds, measured from
+        # the first of them being queued, so the idle time between prayers is left out
+        result['applied_recent'] = sum(count for _, count, _ in recent)
+        span = (recent[-1][0] - min(queued for _, _, queued in recent)) if recent else 0
+        result['throughput_per_s'] = result['applied_recent'] / span if span > 0 else None
+        if latencies:
+            result['latency_s'] = {
+                'median': statistics.median(latencies),
+                'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'max': latencies[-1]
+            }
+        return result
+
+
+def parse_scan(text: str) -> Optional[Tuple[str, Optional[str]]]:
+    """(member id, session) from a ``member id[,session]`` line, None for a blank or comment line"""
+    text = text.strip()
+    if not text or text.startswith('#'):
+        return None
+    member_id, _, session = text.partition(',')
+    return member_id.strip(), session.strip() or None
+
+
+class DropFolderWatcher:
+    """Thread feeding scan files dropped into a folder to a CheckInQueue
+
+    The folder is polled every ``interval`` seconds. Files whose name
+    starts with "." are still being written and are left alone; other
+    files are read line by line (see ``parse_scan``) and moved into
+    ``processed/``.
+    """
+
+    def __init__(self, checkin_queue: CheckInQueue, directory: str, interval: float = 0.5):
+        self.queue = checkin_queue
+        self.directory = directory
+        self.processed_dir = os.path.join(directory, "processed")
+        self.interval = interval
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Queue the scans of every complete file in the folder, return how many files were read"""
+        os.makedirs(self.processed_dir, exist_ok=True)
+        files = 0
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isfile(path):
+                continue
+            with open(path, 'r', encoding='utf-8-sig') as f:
+                scans = [scan for scan in map(parse_scan, f) if scan]
+            self.queue.submit_many(scans)
+            os.replace(path, os.path.join(self.processed_dir, name))
+            files += 1
+        return files
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error reading check-in drop folder: {e}")
+
+    def start(self):
+        """Start the polling thread (no-op when already running)"""
+        if self._thread and self._thread.is_alive():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="masjed-checkin-drop", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the polling thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+class CheckInHandler(BaseHTTPRequestHandler):
+    """POST /checkin with {"member": id, "session": ...} or {"members": [ids], "session": ...};
+    GET /metrics"""
+
+    checkin_queue: CheckInQueue = None
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == "/metrics":
+            self._reply(200, self.checkin_queue.metrics())
+        else:
+            self._reply(404, {'error': "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != "/checkin":
+            self._reply(404, {'error': "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            members = body.get('members') or [body.get('member')]
+            if not isinstance(members, list) or not all(isinstance(member, str) and member for member in members):
+                raise ValueError("member ids must be non-empty strings")
+            session = body.get('session')
+        except (ValueError, AttributeError) as e:
+            self._reply(400, {'error': str(e)})
+            return
+        queued, duplicates = self.checkin_queue.submit_many((member, session) for member in members)
+        self._reply(202, {'queued': queued, 'duplicates': duplicates})
+
+    def log_message(self, format, *args):
+        # One line per scan would drown the output at prayer time
+        pass
+
+
+def make_http_server(checkin_queue: CheckInQueue, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """HTTP server feeding a CheckInQueue (port 0 picks a free port, see ``server_address``)"""
+    handler = type("BoundCheckInHandler", (CheckInHandler,), {'checkin_queue': checkin_queue})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Receive attendance check-ins and award points in batches")
+    parser.add_argument("--backend", choices=STORAGE_BACKENDS, help="defaults to MASJED_STORAGE, then json")
+    parser.add_argument("--data-file", help="data file of the store (defaults to the app's)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="HTTP port (0 disables the endpoint)")
+    parser.add_argument("--drop-dir", help="also read scan files dropped into this folder")
+    parser.add_argument("--points", type=int, default=DEFAULT_POINTS, help="points per check-in")
+    parser.add_argument("--reason", default=DEFAULT_REASON, help="history reason (the session is appended)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--batch-window", type=float, default=DEFAULT_BATCH_WINDOW,
+                        help="seconds to wait for more scans before writing a batch")
+    args = parser.parse_args(argv)
+    if not args.port and not args.drop_dir:
+        parser.error("nothing to listen on: give --port or --drop-dir")
+
+    checkin_queue = CheckInQueue(create_data_manager(args.backend, args.data_file), args.points, args.reason,
+                                 args.batch_size, args.batch_window)
+    checkin_queue.start()
+    watcher = None
+    if args.drop_dir:
+        watcher = DropFolderWatcher(checkin_queue, args.drop_dir)
+        watcher.start()
+        print(f"Watching {args.drop_dir} for scan files", file=sys.stderr)
+    server = None
+    try:
+        if args.port:
+            server = make_http_server(checkin_queue, args.host, args.port)
+            print(f"Listening on http://{args.host}:{server.server_address[1]}/checkin", file=sys.stderr)
+            server.serve_forever()
+        else:
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server:
+            server.server_close()
+        if watcher:
+            watcher.stop()
+            watcher.run_once()
+        checkin_queue.stop(timeout=30)
+        print(json.dumps(checkin_queue.metrics(), ensure_ascii=False), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
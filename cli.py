@@ -0,0 +1,255 @@
+"""Command-line maintenance for the member store, without Streamlit
+
+Works on the same store as the app (``MASJED_STORAGE`` or --backend) and
+takes the same write lock, so it is safe to run while the app is serving.
+
+    python cli.py award attendees.csv --reason "حضور در جلسه"
+    python cli.py import roster.xlsx --dry-run
+    python cli.py export scoring scoring.csv
+    python cli.py backup backups/members.json
+    python cli.py restore backups/members.json --yes
+    python cli.py stats
+    python cli.py check
+    python cli.py compact --format compact
+"""
+import argparse
+import csv
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from data_manager import STORAGE_BACKENDS, create_data_manager, normalize_name
+from exports import REPORTS, write_report
+from snapshot_format import SNAPSHOT_FORMATS
+
+
+def read_award_file(path: str, default_points: int, default_reason: str) -> List[Tuple[str, int, str]]:
+    """(member, points, reason) rows from a CSV or plain list: member[,points[,reason]] per line
+
+    ``member`` is a member id or a full name. Blank lines and lines starting
+    with ``#`` are skipped, as is a header row naming a "member" column.
+    """
+    rows = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for line_no, row in enumerate(csv.reader(f), start=1):
+            row = [cell.strip() for cell in row]
+            if not row or not row[0] or row[0].startswith('#'):
+                continue
+            if line_no == 1 and row[0].lower() in ('member', 'id', 'name', 'عضو', 'نام'):
+                continue
+            try:
+                points = int(row[1]) if len(row) > 1 and row[1] else default_points
+            except ValueError:
+                raise ValueError(f"Line {line_no}: points must be a whole number, got {row[1]!r}")
+            reason = row[2] if len(row) > 2 and row[2] else default_reason
+            rows.append((row[0], points, reason))
+    return rows
+
+
+def resolve_members(data_manager, refs: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """Map each reference (id or full name) to a member id, return (resolved, problems)"""
+    by_name: Dict[str, List[str]] = {}
+    ids = set()
+    for member in data_manager.iter_members():
+        ids.add(member['id'])
+        by_name.setdefault(normalize_name(f"{member['first_name']} {member['last_name']}"), []).append(member['id'])
+
+    resolved, problems = {}, []
+    for ref in dict.fromkeys(refs):
+        if ref in ids:
+            resolved[ref] = ref
+            continue
+        matches = by_name.get(normalize_name(ref), [])
+        if len(matches) == 1:
+            resolved[ref] = matches[0]
+        elif matches:
+            problems.append(f"{ref}: {len(matches)} members have this name, use the member id")
+        else:
+            problems.append(f"{ref}: no such member")
+    return resolved, problems
+
+
+def cmd_award(data_manager, args) -> int:
+    rows = read_award_file(args.file, args.points, args.reason)
+    resolved, problems = resolve_members(data_manager, [ref for ref, _, _ in rows])
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if problems and not args.skip_unknown:
+        print("Nothing awarded (use --skip-unknown to award the members that were found)", file=sys.stderr)
+        return 1
+
+    entries = [(resolved[ref], points, reason) for ref, points, reason in rows if ref in resolved]
+    if args.dry_run:
+        print(f"Would apply {len(entries)} points changes to {len(set(e[0] for e in entries))} members")
+        return 0
+    if not data_manager.apply_points_batch(entries):
+        return 1
+    print(f"Applied {len(entries)} points changes to {len(set(e[0] for e in entries))} members")
+    return 0
+
+
+def cmd_import(data_manager, args) -> int:
+    from member_import import import_members
+
+    result = import_members(data_manager, args.file, dry_run=args.dry_run)
+    for line, name in result['duplicates']:
+        print(f"Line {line}: {name} is already a member, skipped", file=sys.stderr)
+    for line, message in result['errors']:
+        print(f"Line {line}: {message}", file=sys.stderr)
+    verb = "Would add" if args.dry_run else "Added"
+    print(f"{verb} {result['added']} of {result['rows']} members "
+          f"({len(result['duplicates'])} duplicates, {len(result['errors'])} invalid rows)")
+    return 1 if result['errors'] else 0
+
+
+def cmd_export(data_manager, args) -> int:
+    if args.report == 'raw':
+        return 0 if data_manager.export_to_csv(args.output) else 1
+    rows = write_report(data_manager, args.report, args.output)
+    print(f"{rows} rows written to {args.output}")
+    return 0
+
+
+def cmd_backup(data_manager, args) -> int:
+    if args.incremental:
+        point = data_manager.backup_incremental(args.dir)
+        if not point:
+            return 1
+        print(f"Backup point {point} in {args.dir}")
+        return 0
+    if not data_manager.backup_data(args.output):
+        return 1
+    print(f"Backup written to {args.output or 'the default backup file'}")
+    return 0
+
+
+def cmd_restore(data_manager, args) -> int:
+    if not args.yes:
+        print("Restoring replaces all current data; add --yes to confirm", file=sys.stderr)
+        return 1
+    if args.point is not None:
+        point = int(args.point) if args.point.isdigit() else args.point
+        restored = data_manager.restore_backup_point(point, args.dir)
+    else:
+        def progress(count):
+            if count % 1000 == 0:
+                print(f"\r{count} members read", end='', file=sys.stderr)
+        restored = data_manager.restore_data(args.file, progress)
+        print(file=sys.stderr)
+    if not restored:
+        return 1
+    print(f"Restored {data_manager.get_member_count()} members")
+    return 0
+
+
+def cmd_stats(data_manager, args) -> int:
+    count = data_manager.get_member_count()
+    total = history = 0
+    for member in data_manager.iter_members():
+        total += member.get('points', 0)
+        history += data_manager.get_member_history_count_by_id(member['id'])
+    print(f"Members:         {count}")
+    print(f"Total points:    {total}")
+    print(f"Average points:  {total / count if count else 0:.1f}")
+    print(f"History entries: {history}")
+    for level, members in sorted(data_manager.get_level_distribution().items()):
+        print(f"Level {level:>3}:       {members}")
+    leaders = data_manager.get_leaderboard(args.top)
+    if leaders:
+        print(f"Top {len(leaders)}:")
+        for rank, member in enumerate(leaders, 1):
+            print(f"  {rank:>3}. {member['first_name']} {member['last_name']}: {member.get('points', 0)}")
+    return 0
+
+
+def cmd_check(data_manager, args) -> int:
+    problems = data_manager.check_integrity()
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} problems found" if problems else "No problems found")
+    return 1 if problems else 0
+
+
+def cmd_compact(data_manager, args) -> int:
+    if args.format:
+        from sqlite_data_manager import SQLiteDataManager
+        if isinstance(data_manager, SQLiteDataManager):
+            print("Snapshot formats only apply to the json and journal backends", file=sys.stderr)
+            return 1
+        done = data_manager.convert_format(args.format)
+    else:
+        done = data_manager.compact()
+    return 0 if done else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=STORAGE_BACKENDS, help="defaults to MASJED_STORAGE, then json")
+    parser.add_argument("--data-file", help="data file of the store (defaults to the app's)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    award = commands.add_parser("award", help="add points to many members in one write")
+    award.add_argument("file", help="CSV/text file: member id or full name[,points[,reason]] per line")
+    award.add_argument("--points", type=int, default=1, help="points for lines that give none (default 1)")
+    award.add_argument("--reason", default="", help="reason for lines that give none")
+    award.add_argument("--skip-unknown", action="store_true", help="award the members found even if some are not")
+    award.add_argument("--dry-run", action="store_true", help="only check the file")
+    award.set_defaults(handler=cmd_award)
+
+    import_ = commands.add_parser("import", help="add the members of a CSV or Excel roster in one write")
+    import_.add_argument("file", help="roster with first_name and last_name columns (or the Persian headers)")
+    import_.add_argument("--dry-run", action="store_true", help="only validate the file")
+    import_.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="write a CSV report")
+    export.add_argument("report", choices=list(REPORTS) + ['raw'])
+    export.add_argument("output")
+    export.set_defaults(handler=cmd_export)
+
+    backup = commands.add_parser("backup", help="write a full backup, or an incremental backup point")
+    backup.add_argument("output", nargs="?")
+    backup.add_argument("--incremental", action="store_true")
+    backup.add_argument("--dir", default="backups", help="directory of the incremental backups")
+    backup.set_defaults(handler=cmd_backup)
+
+    restore = commands.add_parser("restore", help="replace all data with a backup")
+    restore.add_argument("file", nargs="?")
+    restore.add_argument("--point", help="restore an incremental backup point (position or file name) instead")
+    restore.add_argument("--dir", default="backups", help="directory of the incremental backups")
+    restore.add_argument("--yes", action="store_true", help="confirm replacing the current data")
+    restore.set_defaults(handler=cmd_restore)
+
+    stats = commands.add_parser("stats", help="print totals, level distribution and the top members")
+    stats.add_argument("--top", type=int, default=10)
+    stats.set_defaults(handler=cmd_stats)
+
+    check = commands.add_parser("check", help="check the data for inconsistencies (exit status 1 if any)")
+    check.set_defaults(handler=cmd_check)
+
+    compact = commands.add_parser("compact", help="fold the journal into the snapshot (or vacuum SQLite)")
+    compact.add_argument("--format", choices=SNAPSHOT_FORMATS, help="also rewrite the snapshot in this format")
+    compact.set_defaults(handler=cmd_compact)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "restore" and args.point is None and not args.file:
+        parser.error("restore needs a backup file or --point")
+    if args.command in ("restore", "import") and args.file and not os.path.exists(args.file):
+        parser.error(f"no such file: {args.file}")
+
+    data_manager = create_data_manager(args.backend, args.data_file)
+    try:
+        return args.handler(data_manager, args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        # Write-behind stores (MASJED_FLUSH_WINDOW) must not exit with changes pending
+        data_manager.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Stress check for concurrent writers: no points change may be lost
+
+Many processes, each running many threads with a private DataManager
+(``shared=False``, so every thread goes through the cross-manager file
+locking rather than the one manager a process normally shares), hammer the
+same few members at once. Half of the
+changes are relative (``apply_points_batch``), half are optimistic
+read-modify-writes through ``update_member_points`` with
+``expected_version``, retried on conflict. At the end every member's
+points and history length must equal the number of increments made.
+
+    python concurrency_stress.py --backend journal --processes 4 --threads 8 --ops 50
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_manager import STORAGE_BACKENDS, create_data_manager
+
+
+def data_file_for(backend: str) -> str:
+    return "stress.db" if backend == "sqlite" else "stress.json"
+
+
+def hammer(backend: str, member_ids, ops: int, seed: int):
+    """One writer: ``ops`` increments spread over the members"""
+    data_manager = create_data_manager(backend, data_file_for(backend), shared=False)
+    for i in range(ops):
+        member_id = member_ids[(seed + i) % len(member_ids)]
+        if i % 2 == 0:
+            if not data_manager.apply_points_batch([(member_id, 1, f"stress {seed}/{i}")]):
+                raise RuntimeError("apply_points_batch failed")
+            continue
+        # Optimistic read-modify-write: retry until our version is current
+        while True:
+            member = data_manager.get_member_by_id(member_id)
+            if data_manager.update_member_points_by_id(member_id, member['points'] + 1, f"stress {seed}/{i}",
+                                                       expected_version=member.get('version', 0)):
+                break
+    # With write-behind on, pending changes would otherwise die with the worker
+    # process (multiprocessing children skip atexit handlers)
+    if not data_manager.flush():
+        raise RuntimeError("flush failed")
+
+
+def run_process(backend: str, member_ids, threads: int, ops: int, process_no: int):
+    """One process: ``threads`` concurrent sessions"""
+    errors = []
+
+    def session(thread_no):
+        try:
+            hammer(backend, member_ids, ops, process_no * threads + thread_no)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=session, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise SystemExit(f"process {process_no}: {errors[0]}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=STORAGE_BACKENDS, default="json")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=25, help="increments per thread")
+    parser.add_argument("--members", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the store (and any SQLite migration source) out of the real data
+        os.chdir(workdir)
+        data_manager = create_data_manager(args.backend, data_file_for(args.backend))
+        for n in range(args.members):
+            data_manager.add_member({'first_name': f"عضو {n}", 'last_name': "آزمایشی", 'points': 0})
+        member_ids = [m['id'] for m in data_manager.get_all_members()]
+        # Write-behind would keep the members in this process only; the workers must see them
+        data_manager.flush()
+
+        processes = [
+            multiprocessing.Process(target=run_process,
+                                    args=(args.backend, member_ids, args.threads, args.ops, p))
+            for p in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        if any(process.exitcode for process in processes):
+            print("FAIL: a worker process failed")
+            return 1
+
+        # Count what each member should have received
+        expected = dict.fromkeys(member_ids, 0)
+        for seed in range(args.processes * args.threads):
+            for i in range(args.ops):
+                expected[member_ids[(seed + i) % len(member_ids)]] += 1
+
+        data_manager = create_data_manager(args.backend, data_file_for(args.backend))
+        lost = 0
+        for member_id, want in expected.items():
+            member = data_manager.get_member_by_id(member_id)
+            history = data_manager.get_member_history_count_by_id(member_id)
+            if member['points'] != want or history != want:
+                lost += 1
+                print(f"member {member_id}: points {member['points']}, history {history}, expected {want}")
+
+        total = sum(expected.values())
+        if lost:
+            print(f"FAIL: updates lost on {lost} of {len(expected)} members ({total} increments)")
+            return 1
+        print(f"OK: {total} concurrent increments on {args.backend}, none lost")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
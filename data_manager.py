@@ -1,178 +1,1189 @@
+import atexit
+import copy
+import functools
+import hashlib
 import json
 import os
-from typing import List, Dict, Optional
+import shutil
+import threading
+import uuid
+import weakref
+from datetime import datetime
+from typing import Callable, Iterator, List, Dict, Optional, TextIO, Tuple, Union
+
+from backup_io import iter_backup_records, write_backup
+from delta_backup import BackupChain
+from exports import MEMBER_FIELDS, member_field_rows, write_csv
+from file_lock import lock_for
+import perf
+from history_store import HistoryStore
+from levels import DEFAULT_LEVEL_RULES, LevelRules, load_level_rules
+from points_index import PointsIndex
+from snapshot_format import SNAPSHOT_FORMATS, SnapshotFormatError, decode_members, encode_members
+
+
+# Orderings accepted by DataManager.query_members
+MEMBER_SORT_KEYS = ('added', 'name', 'points_desc', 'points_asc')
+
+
+def new_member_id() -> str:
+    """Generate a persistent unique member id"""
+    return uuid.uuid4().hex
+
+
+# Arabic letter forms and stray characters that make the same Persian name compare unequal
+PERSIAN_NAME_MAP = str.maketrans({'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', '\u200c': ' ', '\u200f': None})
+
+
+def normalize_name(name: str) -> str:
+    """Canonical form of a person's name for matching (Persian letters, single spaces)"""
+    return ' '.join(str(name).translate(PERSIAN_NAME_MAP).split())
+
+
+# Write-behind managers with changes still in memory, flushed at interpreter exit
+_write_behind_managers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_write_behind():
+    """Flush every write-behind DataManager before the process exits"""
+    for manager in list(_write_behind_managers):
+        manager.flush()
+
+
+def _exclusive(method):
+    """Run a DataManager method holding its in-memory state lock and the data file's write lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._state_lock, self._lock:
+            generation = self._lock.generation()
+            if generation != self._generation:
+                # Someone else wrote since we last did: reload before changing anything
+                self._loaded = False
+                self._generation = generation
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class DataManager:
-    """Manages data persistence for the mosque member management system"""
+    """Manages data persistence for the mosque member management system
+
+    Two storage modes are supported:
+
+    * plain JSON (default): every mutation rewrites ``data_file``.
+    * journaled (``journal=True``): ``data_file`` is a snapshot and each
+      mutation is appended as one small JSON line to ``<data_file>.journal``.
+      The in-memory state is rebuilt from snapshot + journal tail on load and
+      the journal is folded back into the snapshot every ``compact_every``
+      records (or on demand via ``compact()``).
+
+    The snapshot is written in ``snapshot_format``: pretty-printed ``json``
+    (the default), minified ``compact`` JSON, or a columnar ``binary``
+    layout (see ``snapshot_format``). Loading detects the format, so a store
+    can be switched with ``convert_format`` at any time.
+
+    Every member carries a stable ``id``; ``self._index`` maps ids to the
+    in-memory records for O(1) lookup. The index-based methods are kept for
+    compatibility and resolve the position to an id first.
+
+    Points history is not part of the member records: it lives in a
+    ``HistoryStore`` under ``<data_file stem>_history/`` and is read a page at
+    a time through ``get_member_history``.
+
+    Writers are serialized across threads and processes by a lock on
+    ``<data_file>.lock``; each mutation reloads the data under the lock
+    before applying, so concurrent sessions never overwrite each other.
+    Every member has a ``version`` that each update or points change bumps;
+    ``update_member_by_id`` and ``update_member_points_by_id`` accept an
+    ``expected_version`` and refuse the change if the member moved on since
+    the caller read it.
+
+    Write-behind (``flush_window`` seconds): mutations are applied in memory
+    at once but written to disk together, ``flush_window`` seconds after the
+    first unflushed change or as soon as ``flush_every`` changes are pending,
+    and always at interpreter exit. Up to ``flush_window`` seconds of changes
+    can be lost in a crash. Their points history is held back with them and
+    written right after them, one append per member, so a crash never leaves
+    history for points that were not stored. If another writer changed the
+    file in the meantime, the pending changes are re-applied on top of its
+    data (points changes as deltas) before flushing.
+
+    Nothing is read at construction: the data file is parsed by the first
+    call that needs it.
+
+    Leaderboard and rank queries are served from a ``PointsIndex``, and each
+    member's level, progress and badges (per ``level_rules``) are derived
+    once per points change. Both are built in bulk on first use after a load
+    and then kept up to date on every commit.
+    """
     
-    def __init__(self, data_file: str = "members_data.json"):
+    def __init__(self, data_file: str = "members_data.json", journal: bool = False,
+                 compact_every: int = 500, level_rules: Optional[LevelRules] = None,
+                 flush_window: Optional[float] = None, flush_every: int = 50,
+                 snapshot_format: str = "json"):
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unknown snapshot format: {snapshot_format}")
         self.data_file = data_file
-        self.members = self._load_data()
+        self.snapshot_format = snapshot_format
+        self.journal = journal
+        self.journal_file = f"{data_file}.journal"
+        self.compact_every = compact_every
+        self.level_rules = level_rules or DEFAULT_LEVEL_RULES
+        self.history = HistoryStore(f"{os.path.splitext(data_file)[0]}_history")
+        # Shared by every instance (and, via flock, every process) using this file
+        self._lock = lock_for(f"{data_file}.lock")
+        # Guards this instance's in-memory members against concurrent reloads
+        self._state_lock = threading.RLock()
+        self._generation = None
+        self._journal_records = 0
+        self._journal_offset = None
+        
+        # Write-behind: committed records not yet on disk
+        self.flush_window = flush_window
+        self.flush_every = flush_every
+        self._pending = []
+        # History entries of the pending records: member id -> entries, written when they are flushed
+        self._pending_history = {}
+        self._flush_timer = None
+        self.flushes = 0
+        if flush_window:
+            _write_behind_managers.add(self)
+        
+        # Change-detection cache: the parsed members are reused until the
+        # data file (or journal) signature on disk changes
+        self._loaded = False
+        self._snapshot_sig = None
+        self._journal_sig = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.tail_replays = 0
+        self.data_version = 0
+        
+        self.members = []
+        self._index = {}
+        self._points_index = None
+        self._progress = None
+        # The data file is read on first use, not here, so opening a store is cheap
+    
+    @staticmethod
+    def _file_signature(path: str) -> Optional[tuple]:
+        """Identity of a file on disk; changes whenever the file is replaced or written"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
     
     def _load_data(self) -> List[Dict]:
-        """Load member data from JSON file"""
+        """Load member data, re-parsing the data file only if it changed on disk"""
+        with self._state_lock:
+            return self._load_data_locked()
+    
+    def _load_data_locked(self) -> List[Dict]:
+        """_load_data, with the in-memory state lock held"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data if isinstance(data, list) else []
-            return []
-        except (json.JSONDecodeError, FileNotFoundError) as e:
+            snapshot_sig = self._file_signature(self.data_file)
+            journal_sig = self._file_signature(self.journal_file) if self.journal else None
+            
+            if self._loaded and snapshot_sig == self._snapshot_sig:
+                if journal_sig == self._journal_sig:
+                    self.cache_hits += 1
+                    return self.members
+                if self._journal_grew(journal_sig) and not self._pending:
+                    # Another writer appended to our journal: replay just the new tail
+                    self.tail_replays += 1
+                    perf.note_reload()
+                    self._journal_sig = journal_sig
+                    self._journal_records += self._replay_journal(
+                        self.members, self._index, None, self._journal_offset)
+                    self._invalidate_derived()
+                    self.data_version += 1
+                    return self.members
+            
+            self.cache_misses += 1
+            perf.note_reload()
+            members = []
+            snapshot_hash = None
+            if snapshot_sig is not None:
+                with open(self.data_file, 'rb') as f:
+                    raw = f.read()
+                perf.observe("DataManager.load_bytes", len(raw), "bytes")
+                snapshot_hash = self._snapshot_hash(raw)
+                members = decode_members(raw)
+            index = self._build_index(members)
+            if self.journal:
+                self._journal_records = self._replay_journal(members, index, snapshot_hash)
+            if self._pending:
+                # Another writer changed the file under our unflushed changes
+                self._rebase_pending(members, index)
+            
+            self._snapshot_sig = snapshot_sig
+            self._journal_sig = journal_sig
+            self._loaded = True
+            self.data_version += 1
+            
+            self._invalidate_derived()
+            
+            # Data written before members had ids, or with history stored
+            # inline, is upgraded once and persisted
+            needs_upgrade = self._backfill_ids(members)
+            needs_upgrade = self._move_inline_history(members) or needs_upgrade
+            if needs_upgrade:
+                with self._lock:
+                    if self._file_signature(self.data_file) != snapshot_sig:
+                        # Another writer got there first; use its upgraded data
+                        self._loaded = False
+                        return self._load_data_locked()
+                    self._set_members(members)
+                    self._save_data()
+            else:
+                self._index = index
+            return members
+        except (json.JSONDecodeError, SnapshotFormatError, UnicodeDecodeError, FileNotFoundError) as e:
             print(f"Error loading data: {e}")
+            self._loaded = False
             return []
     
+    @staticmethod
+    def _build_index(members: List[Dict]) -> Dict[str, Dict]:
+        """Map member id -> member record"""
+        return {member['id']: member for member in members if member.get('id')}
+    
+    @staticmethod
+    def _backfill_ids(members: List[Dict]) -> bool:
+        """Give every member without a unique id a new one, return whether any changed"""
+        seen = set()
+        changed = False
+        for member in members:
+            if not member.get('id') or member['id'] in seen:
+                member['id'] = new_member_id()
+                changed = True
+            seen.add(member['id'])
+        return changed
+    
+    def _move_inline_history(self, members: List[Dict]) -> bool:
+        """Move any inline points_history into the history store, return whether any moved"""
+        moved = False
+        for member in members:
+            if 'points_history' in member:
+                history = member.pop('points_history')
+                if history:
+                    # Replace rather than append so an interrupted upgrade can simply rerun
+                    self.history.replace(member['id'], history)
+                moved = True
+        return moved
+    
+    def _set_members(self, members: List[Dict]):
+        """Replace the in-memory member list and its id index"""
+        self._backfill_ids(members)
+        self.members = members
+        self._index = self._build_index(members)
+        self._invalidate_derived()
+    
+    def _journal_grew(self, journal_sig: Optional[tuple]) -> bool:
+        """Whether the journal is the same file as last read, only longer"""
+        return (journal_sig is not None and self._journal_sig is not None
+                and self._journal_offset is not None
+                and journal_sig[0] == self._journal_sig[0]
+                and journal_sig[1] > self._journal_sig[1])
+    
+    def _mark_saved(self):
+        """Record that memory and disk agree after one of our own writes (made under the write lock)"""
+        self._generation = self._lock.bump_generation()
+        self._snapshot_sig = self._file_signature(self.data_file)
+        if self.journal:
+            self._journal_sig = self._file_signature(self.journal_file)
+            self._journal_offset = self._journal_sig[1] if self._journal_sig else None
+        self._loaded = True
+        self.data_version += 1
+    
+    def data_key(self) -> tuple:
+        """Token that is equal for any two managers holding the same data
+
+        Unlike ``data_version`` (which counts this instance's own loads and
+        commits) it is comparable across sessions, so views derived from the
+        data can be shared between them (see ``view_cache``).
+        """
+        self.members = self._load_data()
+        if self._pending:
+            # Ahead of the disk: only this (process-wide) instance has this data
+            return ('memory', id(self), self.data_version)
+        return (os.path.abspath(self.data_file), self._snapshot_sig, self._journal_sig)
+    
+    def cache_stats(self) -> Dict:
+        """Read-cache counters, to confirm getters are served from memory"""
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'tail_replays': self.tail_replays,
+            'data_version': self.data_version
+        }
+    
     def _save_data(self) -> bool:
-        """Save member data to JSON file"""
+        """Save member data to the data file in the configured snapshot format"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.members, f, ensure_ascii=False, indent=2)
+            raw = encode_members(self.members, self.snapshot_format)
+            perf.observe("DataManager.save_bytes", len(raw), "bytes")
+            self._write_atomic(self.data_file, raw)
+            # Everything in memory is now on disk, including any write-behind changes
+            self._pending = []
+            self._cancel_flush()
+            self._write_pending_history()
+            if self.journal:
+                # The snapshot now holds everything; start a fresh journal bound to it
+                self._start_journal(self._snapshot_hash(raw))
+            self._mark_saved()
             return True
         except Exception as e:
             print(f"Error saving data: {e}")
+            # Memory may now be ahead of disk; force the next read to reload
+            self._loaded = False
             return False
     
+    @staticmethod
+    def _snapshot_hash(raw: bytes) -> str:
+        """Fingerprint of a snapshot, used to tie a journal to the snapshot it extends"""
+        return hashlib.sha1(raw).hexdigest()
+    
+    @staticmethod
+    def _write_atomic(path: str, raw: bytes):
+        """Write bytes to path via a temp file and rename so readers never see a partial file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+    
+    def _start_journal(self, snapshot_hash: str):
+        """Replace the journal with an empty one whose header points at the given snapshot"""
+        header = json.dumps({'op': 'header', 'base': snapshot_hash}) + '\n'
+        self._write_atomic(self.journal_file, header.encode('utf-8'))
+        self._journal_records = 0
+    
+    def _replay_journal(self, members: List[Dict], index: Dict[str, Dict],
+                        snapshot_hash: Optional[str], start: int = 0) -> int:
+        """Apply journal records from byte offset ``start`` on top of members, return how many were applied"""
+        self._journal_offset = None
+        if not os.path.exists(self.journal_file):
+            return 0
+        
+        applied = 0
+        offset = start
+        with open(self.journal_file, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Still being appended by another writer; picked up on the next read
+                    break
+                line_start = offset
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # A torn write from a crash mid-append; it was never acknowledged
+                    print(f"Ignoring unreadable journal record at byte {line_start}")
+                    continue
+                
+                if line_start == 0:
+                    # A journal written for a different snapshot was already compacted into it
+                    if record.get('op') != 'header' or record.get('base') != snapshot_hash:
+                        return 0
+                    continue
+                
+                self._apply_record(members, index, record)
+                applied += 1
+        
+        self._journal_offset = offset
+        return applied
+    
+    def _append_journal(self, records: List[Dict]) -> bool:
+        """Append mutation records to the journal in one write, compacting when it grows too long"""
+        if self._journal_offset is None or not os.path.exists(self.journal_file):
+            # No usable journal: bind a new one to the snapshot currently on disk
+            if not os.path.exists(self.data_file):
+                return self._save_data()
+            with open(self.data_file, 'rb') as f:
+                self._start_journal(self._snapshot_hash(f.read()))
+        
+        line = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        with open(self.journal_file, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                # Terminate a torn record so the new one starts on its own line
+                line = '\n' + line
+        
+        perf.observe("DataManager.journal_bytes", len(line.encode('utf-8')), "bytes")
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_records += len(records)
+        self._mark_saved()
+        
+        if self._journal_records >= self.compact_every:
+            return self.compact()
+        return True
+    
+    def _commit(self, record: Dict, history: Optional[Dict[str, List[Dict]]] = None) -> bool:
+        """Apply a mutation record in memory and persist it (or queue it in write-behind mode)
+
+        ``history`` (member id -> new entries) is logged once the record is
+        saved; in write-behind mode it is queued with the record, before a
+        full queue triggers a flush, so the flush writes both.
+        """
+        self._apply_record(self.members, self._index, record)
+        self._track_derived(record)
+        if self.flush_window:
+            # Keep a private copy: the member dicts in memory keep changing
+            self._pending.append(copy.deepcopy(record))
+            for member_id, entries in (history or {}).items():
+                self._pending_history.setdefault(member_id, []).extend(entries)
+            self.data_version += 1
+            if len(self._pending) >= self.flush_every:
+                return self.flush()
+            self._schedule_flush()
+            return True
+        try:
+            saved = self._append_journal([record]) if self.journal else self._save_data()
+            if saved:
+                for member_id, entries in (history or {}).items():
+                    self.history.append(member_id, entries)
+            return saved
+        except Exception:
+            # Memory may now be ahead of disk; force the next read to reload
+            self._loaded = False
+            raise
+    
+    def _schedule_flush(self):
+        """Start the flush timer unless one is already running"""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_window, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def _cancel_flush(self):
+        """Stop a pending flush timer"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+    
+    @_exclusive
+    def flush(self) -> bool:
+        """Write all pending write-behind changes to disk in one durable write"""
+        self._cancel_flush()
+        if not self._pending:
+            if self._pending_history:
+                # History of records that already reached disk
+                self.members = self._load_data()
+                self._write_pending_history()
+            return True
+        try:
+            # Picks up (and rebases onto) anything another writer flushed meanwhile
+            self.members = self._load_data()
+            if self.journal:
+                pending, self._pending = self._pending, []
+                try:
+                    saved = self._append_journal(pending)
+                except Exception:
+                    self._pending = pending + self._pending
+                    raise
+                if saved:
+                    self._write_pending_history()
+            else:
+                saved = self._save_data()
+            self.flushes += 1
+            if not saved and self._pending:
+                self._schedule_flush()
+            return saved
+        except Exception as e:
+            print(f"Error flushing pending changes: {e}")
+            if self._pending:
+                self._schedule_flush()
+            return False
+    
+    def _write_pending_history(self):
+        """Write the history of the records just flushed, one append (and fsync) per member"""
+        pending, self._pending_history = self._pending_history, {}
+        for member_id, entries in pending.items():
+            # A member deleted by another writer meanwhile keeps no history
+            if member_id not in self._index:
+                continue
+            try:
+                self.history.append(member_id, entries)
+            except OSError as e:
+                # The points are already saved; do not report the flush as failed
+                print(f"Error writing points history: {e}")
+    
+    def _rebase_pending(self, members: List[Dict], index: Dict[str, Dict]):
+        """Re-apply unflushed write-behind records on top of newer data from disk"""
+        rebased = []
+        for record in self._pending:
+            record = self._reapply(members, index, record)
+            if record is not None:
+                rebased.append(record)
+        self._pending = rebased
+    
+    @classmethod
+    def _reapply(cls, members: List[Dict], index: Dict[str, Dict], record: Dict) -> Optional[Dict]:
+        """Apply a record again on newer data, return it as applied (None if it no longer applies)"""
+        op = record['op']
+        if op == 'batch':
+            applied = [r for r in (cls._reapply(members, index, sub) for sub in record['records']) if r]
+            return {'op': 'batch', 'records': applied} if applied else None
+        if op == 'add':
+            if record['member'].get('id') in index:
+                return None
+            record = copy.deepcopy(record)
+        elif record.get('id') not in index:
+            # The member was deleted by the other writer
+            return None
+        if op == 'points' and 'change' in record:
+            # Points changes are deltas: land them on the other writer's total
+            record = dict(record, points=max(0, index[record['id']].get('points', 0) + record['change']))
+        cls._apply_record(members, index, record)
+        return record
+    
+    def _invalidate_derived(self):
+        """Drop the points index and derived level fields; rebuilt in bulk on next use"""
+        self._points_index = None
+        self._progress = None
+    
+    def _track_derived(self, record: Dict):
+        """Keep the points index and derived level fields (when built) in step with a committed record"""
+        op = record['op']
+        if op == 'batch':
+            for sub_record in record['records']:
+                self._track_derived(sub_record)
+            return
+        
+        if op == 'delete':
+            if self._points_index is not None:
+                self._points_index.remove(record['id'])
+            if self._progress is not None:
+                self._progress.pop(record['id'], None)
+            return
+        
+        member_id = record['member']['id'] if op == 'add' else record['id']
+        points = self._index[member_id].get('points', 0)
+        if self._points_index is not None:
+            self._points_index.update(member_id, points)
+        if self._progress is not None:
+            self._progress[member_id] = self.level_rules.progress(points)
+    
+    def _ranking(self) -> PointsIndex:
+        """The points index for the current data, built on first use"""
+        self.members = self._load_data()
+        if self._points_index is None:
+            self._points_index = PointsIndex((m['id'], m.get('points', 0)) for m in self.members)
+        return self._points_index
+    
+    def _derived_progress(self) -> Dict[str, Dict]:
+        """Level, progress and badges per member id, computed in bulk on first use"""
+        self.members = self._load_data()
+        if self._progress is None:
+            bulk = self.level_rules.progress_bulk([m.get('points', 0) for m in self.members])
+            self._progress = {m['id']: progress for m, progress in zip(self.members, bulk)}
+        return self._progress
+    
+    @staticmethod
+    def _record_target(members: List[Dict], index: Dict[str, Dict], record: Dict) -> Dict:
+        """The member a record refers to (by id, or by position for older journals)"""
+        if 'id' in record:
+            return index[record['id']]
+        return members[record['index']]
+    
+    @classmethod
+    def _apply_record(cls, members: List[Dict], index: Dict[str, Dict], record: Dict):
+        """Apply a single mutation record to a member list and its id index"""
+        op = record['op']
+        if op == 'add':
+            member = record['member']
+            members.append(member)
+            if member.get('id'):
+                index[member['id']] = member
+        elif op == 'update':
+            member = cls._record_target(members, index, record)
+            history = member.get('points_history')
+            version = member.get('version', 0)
+            member.clear()
+            member.update(record['member'])
+            member['version'] = version + 1
+            if history is not None and 'points_history' not in record['member']:
+                member['points_history'] = history
+        elif op == 'points':
+            member = cls._record_target(members, index, record)
+            member['points'] = record['points']
+            member['version'] = member.get('version', 0) + 1
+            if 'entry' in record:
+                # Journals written before history had its own store
+                member.setdefault('points_history', []).append(record['entry'])
+        elif op == 'delete':
+            member = cls._record_target(members, index, record)
+            position = next(i for i, m in enumerate(members) if m is member)
+            del members[position]
+            index.pop(member.get('id'), None)
+        elif op == 'batch':
+            for sub_record in record['records']:
+                cls._apply_record(members, index, sub_record)
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
+    
+    @_exclusive
+    def compact(self) -> bool:
+        """Fold the journal into a fresh snapshot"""
+        self.members = self._load_data()
+        return self._save_data()
+    
+    @_exclusive
+    def convert_format(self, snapshot_format: str) -> bool:
+        """Rewrite the snapshot in another format and keep writing it that way"""
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            print(f"Error converting data: unknown snapshot format {snapshot_format}")
+            return False
+        self.members = self._load_data()
+        previous, self.snapshot_format = self.snapshot_format, snapshot_format
+        if not self._save_data():
+            self.snapshot_format = previous
+            return False
+        return True
+    
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    
+    def _id_at(self, index: int) -> Optional[str]:
+        """Id of the member at a list position"""
+        self.members = self._load_data()
+        if 0 <= index < len(self.members):
+            return self.members[index]['id']
+        return None
+    
+    @_exclusive
     def add_member(self, member_data: Dict) -> bool:
-        """Add a new member"""
+        """Add a new member (a fresh id is assigned unless a unique one is given)"""
         try:
             # Ensure points field exists
             if 'points' not in member_data:
                 member_data['points'] = 0
             
-            self.members.append(member_data)
-            return self._save_data()
+            self.members = self._load_data()
+            if not member_data.get('id') or member_data['id'] in self._index:
+                member_data['id'] = new_member_id()
+            history = member_data.pop('points_history', None)
+            if not self._commit({'op': 'add', 'member': member_data}):
+                return False
+            if history:
+                self.history.replace(member_data['id'], history)
+            return True
         except Exception as e:
             print(f"Error adding member: {e}")
             return False
     
+    @_exclusive
+    def add_members(self, members: List[Dict]) -> bool:
+        """Add many members with a single write (one journal line or one snapshot rewrite)"""
+        try:
+            self.members = self._load_data()
+            taken = set(self._index)
+            records = []
+            histories = {}
+            for member_data in members:
+                member_data.setdefault('points', 0)
+                if not member_data.get('id') or member_data['id'] in taken:
+                    member_data['id'] = new_member_id()
+                taken.add(member_data['id'])
+                history = member_data.pop('points_history', None)
+                if history:
+                    histories[member_data['id']] = history
+                records.append({'op': 'add', 'member': member_data})
+            
+            if not records:
+                return True
+            if not self._commit({'op': 'batch', 'records': records}):
+                return False
+            for member_id, history in histories.items():
+                self.history.replace(member_id, history)
+            return True
+        except Exception as e:
+            print(f"Error adding members: {e}")
+            return False
+    
     def get_all_members(self) -> List[Dict]:
-        """Get all members"""
+        """Get all members (points history is kept separately, see get_member_history)"""
         # Reload data to ensure we have the latest version
         self.members = self._load_data()
         return self.members.copy()
     
+    def get_all_members_with_history(self) -> List[Dict]:
+        """Get all members with their full points_history inline, as stored in backups"""
+        members = []
+        for member in self.get_all_members():
+            member = member.copy()
+            member['points_history'] = self.get_member_history_by_id(member['id'])
+            members.append(member)
+        return members
+    
+    def iter_members(self, sort_by: str = "added", batch_size: int = 500) -> Iterator[Dict]:
+        """Yield every member in ``sort_by`` order (see query_members)
+
+        Members are copied ``batch_size`` at a time under the state lock, so
+        writers wait for one batch at most rather than the whole iteration.
+        """
+        batch_size = max(1, batch_size)
+        members = self._matching_members("", sort_by)
+        for start in range(0, len(members), batch_size):
+            with self._state_lock:
+                batch = [m.copy() for m in members[start:start + batch_size]]
+            yield from batch
+    
     def get_member(self, index: int) -> Optional[Dict]:
         """Get a specific member by index"""
+        member_id = self._id_at(index)
+        return self.get_member_by_id(member_id) if member_id else None
+    
+    def get_member_by_id(self, member_id: str) -> Optional[Dict]:
+        """Get a specific member by id"""
         try:
             self.members = self._load_data()
-            if 0 <= index < len(self.members):
-                return self.members[index].copy()
-            return None
+            member = self._index.get(member_id)
+            return member.copy() if member else None
         except Exception as e:
             print(f"Error getting member: {e}")
             return None
     
     def update_member(self, index: int, updated_data: Dict) -> bool:
         """Update a member's information"""
+        member_id = self._id_at(index)
+        return self.update_member_by_id(member_id, updated_data) if member_id else False
+    
+    @_exclusive
+    def update_member_by_id(self, member_id: str, updated_data: Dict,
+                            expected_version: Optional[int] = None) -> bool:
+        """Update a member's information by id (points history is kept unless given)
+
+        With ``expected_version`` the update is refused (False) if the member
+        has changed since that version was read.
+        """
         try:
             self.members = self._load_data()
-            if 0 <= index < len(self.members):
-                # Preserve points if not in updated data
-                if 'points' not in updated_data:
-                    updated_data['points'] = self.members[index].get('points', 0)
-                
-                self.members[index] = updated_data
-                return self._save_data()
-            return False
+            member = self._index.get(member_id)
+            if member is None or self._is_stale(member, expected_version):
+                return False
+            
+            updated_data.pop('version', None)
+            # Preserve points if not in updated data
+            if 'points' not in updated_data:
+                updated_data['points'] = member.get('points', 0)
+            updated_data['id'] = member_id
+            history = updated_data.pop('points_history', None)
+            
+            if not self._commit({'op': 'update', 'id': member_id, 'member': updated_data}):
+                return False
+            if history is not None:
+                self._pending_history.pop(member_id, None)
+                self.history.replace(member_id, history)
+            return True
         except Exception as e:
             print(f"Error updating member: {e}")
             return False
     
+    @staticmethod
+    def _is_stale(member: Dict, expected_version: Optional[int]) -> bool:
+        """Whether an optimistic update was based on an older version of the member"""
+        if expected_version is None or member.get('version', 0) == expected_version:
+            return False
+        print(f"Conflicting update for member {member.get('id')}: "
+              f"expected version {expected_version}, found {member.get('version', 0)}")
+        return True
+    
     def update_member_points(self, index: int, new_points: int, reason: str = "") -> bool:
         """Update a member's points and log the change"""
+        member_id = self._id_at(index)
+        return self.update_member_points_by_id(member_id, new_points, reason) if member_id else False
+    
+    @_exclusive
+    def update_member_points_by_id(self, member_id: str, new_points: int, reason: str = "",
+                                   expected_version: Optional[int] = None) -> bool:
+        """Update a member's points by id and log the change
+
+        With ``expected_version`` the change is refused (False) if the member
+        has changed since that version was read; to add or remove points
+        without a read-modify-write use ``apply_points_batch``.
+        """
         try:
             self.members = self._load_data()
-            if 0 <= index < len(self.members):
-                old_points = self.members[index].get('points', 0)
-                self.members[index]['points'] = max(0, new_points)  # Ensure points don't go negative
-                
-                # Initialize history if it doesn't exist
-                if 'points_history' not in self.members[index]:
-                    self.members[index]['points_history'] = []
-                
-                # Add history entry
-                from datetime import datetime
-                change = new_points - old_points
-                history_entry = {
-                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'old_points': old_points,
-                    'new_points': new_points,
-                    'change': change,
-                    'reason': reason
-                }
-                self.members[index]['points_history'].append(history_entry)
-                
-                return self._save_data()
-            return False
+            member = self._index.get(member_id)
+            if member is None or self._is_stale(member, expected_version):
+                return False
+            
+            old_points = member.get('points', 0)
+            
+            # Add history entry
+            change = new_points - old_points
+            history_entry = {
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'old_points': old_points,
+                'new_points': new_points,
+                'change': change,
+                'reason': reason
+            }
+            
+            return self._commit({
+                'op': 'points',
+                'id': member_id,
+                'points': max(0, new_points),  # Ensure points don't go negative
+                'change': max(0, new_points) - old_points
+            }, {member_id: [history_entry]})
         except Exception as e:
             print(f"Error updating member points: {e}")
             return False
     
-    def get_member_history(self, index: int) -> list:
-        """Get points history for a specific member"""
+    def get_member_history(self, index: int, offset: int = 0, limit: Optional[int] = None) -> list:
+        """Get points history for a specific member (oldest first), optionally one page of it"""
+        member_id = self._id_at(index)
+        return self.get_member_history_by_id(member_id, offset, limit) if member_id else []
+    
+    def get_member_history_by_id(self, member_id: str, offset: int = 0, limit: Optional[int] = None) -> list:
+        """Get points history entries ``offset`` .. ``offset + limit`` for a member by id (oldest first)"""
         try:
-            self.members = self._load_data()
-            if 0 <= index < len(self.members):
-                return self.members[index].get('points_history', [])
-            return []
+            pending = list(self._pending_history.get(member_id, ()))
+            entries = self.history.read(member_id, offset, limit)
+            if pending:
+                # Entries still waiting for a write-behind flush come after the stored ones
+                start = max(0, offset - self.history.count(member_id))
+                stop = None if limit is None else start + max(0, limit - len(entries))
+                entries += pending[start:stop]
+            return entries
         except Exception as e:
             print(f"Error getting member history: {e}")
             return []
     
+    def iter_member_history_by_id(self, member_id: str, batch_size: int = 500) -> Iterator[Dict]:
+        """Yield a member's whole points history (oldest first), ``batch_size`` entries per read"""
+        offset = 0
+        while True:
+            entries = self.get_member_history_by_id(member_id, offset, batch_size)
+            yield from entries
+            if len(entries) < batch_size:
+                return
+            offset += batch_size
+    
+    def get_member_history_count(self, index: int) -> int:
+        """Number of points history entries for a specific member"""
+        member_id = self._id_at(index)
+        return self.get_member_history_count_by_id(member_id) if member_id else 0
+    
+    def get_member_history_count_by_id(self, member_id: str) -> int:
+        """Number of points history entries for a member by id"""
+        try:
+            return self.history.count(member_id) + len(self._pending_history.get(member_id, ()))
+        except Exception as e:
+            print(f"Error counting member history: {e}")
+            return 0
+    
     def delete_member(self, index: int) -> bool:
         """Delete a member"""
+        member_id = self._id_at(index)
+        return self.delete_member_by_id(member_id) if member_id else False
+    
+    @_exclusive
+    def delete_member_by_id(self, member_id: str) -> bool:
+        """Delete a member by id"""
         try:
             self.members = self._load_data()
-            if 0 <= index < len(self.members):
-                del self.members[index]
-                return self._save_data()
-            return False
+            if member_id not in self._index:
+                return False
+            if not self._commit({'op': 'delete', 'id': member_id}):
+                return False
+            self._pending_history.pop(member_id, None)
+            self.history.delete(member_id)
+            return True
         except Exception as e:
             print(f"Error deleting member: {e}")
             return False
     
-    def get_leaderboard(self) -> List[Dict]:
-        """Get members sorted by points (highest first)"""
+    def _resolve_member(self, member_ref) -> Optional[str]:
+        """Member id for a batch reference: a member id or a list index"""
+        if isinstance(member_ref, str):
+            return member_ref if member_ref in self._index else None
+        if isinstance(member_ref, int) and not isinstance(member_ref, bool):
+            if 0 <= member_ref < len(self.members):
+                return self.members[member_ref]['id']
+        return None
+    
+    @staticmethod
+    def _validate_batch_entry(entry) -> Optional[str]:
+        """Why a (member, delta, reason) batch entry is malformed, or None if it is fine"""
+        if not isinstance(entry, (tuple, list)) or len(entry) != 3:
+            return "expected (member, delta, reason)"
+        _, delta, reason = entry
+        if not isinstance(delta, int) or isinstance(delta, bool):
+            return f"delta must be an integer, got {delta!r}"
+        if not isinstance(reason, str):
+            return f"reason must be a string, got {reason!r}"
+        return None
+    
+    @_exclusive
+    def apply_points_batch(self, entries: List[tuple]) -> bool:
+        """Apply many (member, delta, reason) point changes and persist them with one write
+
+        ``member`` is a member id or a list index. Every entry is validated
+        before anything is applied; if any entry is invalid nothing changes.
+        A member may appear more than once; the deltas accumulate in order.
+        """
+        try:
+            self.members = self._load_data()
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            running_points = {}
+            records = []
+            history = {}
+            
+            for entry in entries:
+                problem = self._validate_batch_entry(entry)
+                member_id = None if problem else self._resolve_member(entry[0])
+                if problem or member_id is None:
+                    print(f"Invalid points batch entry {entry!r}: {problem or 'unknown member'}")
+                    return False
+                
+                _, delta, reason = entry
+                old_points = running_points.get(member_id, self._index[member_id].get('points', 0))
+                new_points = max(0, old_points + delta)  # Ensure points don't go negative
+                running_points[member_id] = new_points
+                records.append({'op': 'points', 'id': member_id, 'points': new_points,
+                                'change': new_points - old_points})
+                history.setdefault(member_id, []).append({
+                    'timestamp': timestamp,
+                    'old_points': old_points,
+                    'new_points': new_points,
+                    'change': new_points - old_points,
+                    'reason': reason
+                })
+            
+            if not records:
+                return True
+            # One record (a single journal line or a single snapshot rewrite) for the whole batch
+            return self._commit({'op': 'batch', 'records': records}, history)
+        except Exception as e:
+            print(f"Error applying points batch: {e}")
+            return False
+    
+    def query_members(self, search: str = "", sort_by: str = "added", offset: int = 0,
+                      limit: Optional[int] = None) -> Tuple[int, List[Dict]]:
+        """Search, sort and page through members, return (total matches, requested page)
+
+        ``search`` matches anywhere in "first_name last_name"; ``sort_by`` is
+        one of ``MEMBER_SORT_KEYS`` ('name' orders by last name, then first).
+        """
+        matches = self._matching_members(search, sort_by)
+        offset = max(0, offset)
+        end = None if limit is None else offset + max(0, limit)
+        return len(matches), [m.copy() for m in matches[offset:end]]
+    
+    def _matching_members(self, search: str, sort_by: str) -> List[Dict]:
+        """The (uncopied) members matching ``search`` in ``sort_by`` order"""
+        if sort_by not in MEMBER_SORT_KEYS:
+            raise ValueError(f"Unknown sort order: {sort_by}")
+        
         self.members = self._load_data()
-        return sorted(self.members, key=lambda x: x.get('points', 0), reverse=True)
+        matches = self.members
+        needle = search.strip().lower()
+        if needle:
+            matches = [m for m in matches
+                       if needle in f"{m.get('first_name', '')} {m.get('last_name', '')}".lower()]
+        
+        if sort_by == 'name':
+            matches = sorted(matches, key=lambda m: (m.get('last_name', ''), m.get('first_name', '')))
+        elif sort_by == 'points_desc':
+            matches = sorted(matches, key=lambda m: m.get('points', 0), reverse=True)
+        elif sort_by == 'points_asc':
+            matches = sorted(matches, key=lambda m: m.get('points', 0))
+        elif matches is self.members:
+            # Adds and deletes change self.members in place; return a stable list
+            matches = list(matches)
+        return matches
+    
+    def get_leaderboard(self, limit: Optional[int] = None) -> List[Dict]:
+        """Get members sorted by points (highest first), optionally only the top ``limit``"""
+        ranking = self._ranking()
+        return [self._index[member_id].copy() for member_id in ranking.top(limit)]
+    
+    def get_member_rank(self, member_id: str) -> Optional[int]:
+        """1-based leaderboard position of a member"""
+        return self._ranking().rank(member_id)
+    
+    def get_member_percentile(self, member_id: str) -> Optional[float]:
+        """Share of members (0-100) with fewer points than this member"""
+        return self._ranking().percentile(member_id)
+    
+    def get_members_in_level_range(self, min_level: int, max_level: Optional[int] = None) -> List[Dict]:
+        """Members whose level is between min_level and max_level (inclusive), highest points first"""
+        ranking = self._ranking()
+        min_points, max_points = self.level_rules.points_range(min_level, max_level)
+        return [self._index[member_id].copy() for member_id in ranking.in_points_range(min_points, max_points)]
+    
+    def get_member_progress(self, member_id: str) -> Optional[Dict]:
+        """Derived level, points_in_level, points_for_next and badges for a member"""
+        return self._derived_progress().get(member_id)
+    
+    def get_level_distribution(self) -> Dict[int, int]:
+        """Number of members at each level"""
+        counts = {}
+        for progress in self._derived_progress().values():
+            counts[progress['level']] = counts.get(progress['level'], 0) + 1
+        return counts
+    
+    def set_level_rules(self, level_rules: LevelRules):
+        """Switch to a new rule table and recompute every member's derived fields in bulk"""
+        self.level_rules = level_rules
+        self._progress = None
+        self._derived_progress()
     
     def get_member_count(self) -> int:
         """Get total number of members"""
         self.members = self._load_data()
         return len(self.members)
     
+    def check_integrity(self) -> List[str]:
+        """Problems found in the stored data (empty when it is consistent)"""
+        problems = []
+        seen = set()
+        for member in self.iter_members():
+            member_id = member.get('id')
+            label = f"{member.get('first_name', '')} {member.get('last_name', '')} ({member_id})"
+            if not member_id or member_id in seen:
+                problems.append(f"Missing or duplicate id: {label}")
+            seen.add(member_id)
+            
+            points = member.get('points', 0)
+            if isinstance(points, bool) or not isinstance(points, int) or points < 0:
+                problems.append(f"Invalid points {points!r}: {label}")
+                continue
+            count = self.get_member_history_count_by_id(member_id)
+            if count:
+                last = self.get_member_history_by_id(member_id, count - 1)[-1]
+                expected = max(0, last.get('new_points', 0))
+                if points != expected:
+                    problems.append(f"Points {points} differ from the last history entry ({expected}): {label}")
+        return problems + self._check_storage(seen)
+    
+    def _check_storage(self, member_ids) -> List[str]:
+        """Backend-specific problems: history segments of members that no longer exist"""
+        return [f"History of an unknown member: {path}" for path in self.history.orphans(member_ids)]
+    
     def backup_data(self, backup_file: str = None) -> bool:
         """Create a backup of the current data"""
         try:
             if backup_file is None:
-                from datetime import datetime
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 backup_file = f"members_backup_{timestamp}.json"
             
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(self.members, f, ensure_ascii=False, indent=2)
+            tmp_file = f"{backup_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                self.write_backup(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, backup_file)
             return True
         except Exception as e:
             print(f"Error creating backup: {e}")
             return False
     
-    def restore_data(self, backup_file: str) -> bool:
+    def write_backup(self, f: TextIO) -> int:
+        """Stream every member with its points_history inline to an open text file, return the member count"""
+        return write_backup(f, self.iter_members(), self.iter_member_history_by_id)
+    
+    def restore_data(self, backup_file: str, progress: Optional[Callable[[int], None]] = None) -> bool:
         """Restore data from a backup file"""
         try:
             if os.path.exists(backup_file):
                 with open(backup_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        self.members = data
-                        return self._save_data()
+                    return self.restore_from(f, progress)
             return False
         except Exception as e:
             print(f"Error restoring backup: {e}")
             return False
     
+    @_exclusive
+    def restore_from(self, f: TextIO, progress: Optional[Callable[[int], None]] = None) -> bool:
+        """Replace all data with a backup read incrementally from an open text file
+
+        Each member is validated as it is read and its history goes straight
+        to a staging history store; only once the whole backup has been read
+        is the staging store swapped in and the member file atomically
+        replaced, so an invalid backup leaves the current data untouched.
+        If the member file cannot be written the previous history is put
+        back, keeping members and history consistent.
+        ``progress`` is called with the number of members read so far.
+        """
+        staging = HistoryStore(f"{self.history.directory}.restore")
+        adopted = False
+        try:
+            staging.clear()
+            members = []
+            seen = set()
+            for member in iter_backup_records(f, progress):
+                history = member.pop('points_history', [])
+                if not member.get('id') or member['id'] in seen:
+                    member['id'] = new_member_id()
+                seen.add(member['id'])
+                staging.append(member['id'], history, sync=False)
+                members.append(member)
+            
+            self.history.adopt(staging, keep_retired=True)
+            adopted = True
+            self._pending_history = {}
+            self._set_members(members)
+            if not self._save_data():
+                self.history.reinstate_retired()
+                return False
+            self.history.discard_retired()
+            return True
+        except Exception as e:
+            print(f"Error restoring backup: {e}")
+            shutil.rmtree(staging.directory, ignore_errors=True)
+            if adopted:
+                self.history.reinstate_retired()
+                self._loaded = False
+            return False
+    
+    def backup_incremental(self, backup_dir: str = "backups", full_every: int = 24) -> Optional[str]:
+        """Add a point to the delta backup chain in backup_dir, return its file name
+
+        A full base is taken first and then after every ``full_every``
+        deltas; in between only changed members and new history are stored.
+        """
+        try:
+            return BackupChain(backup_dir).write(self, full_every)
+        except Exception as e:
+            print(f"Error creating incremental backup: {e}")
+            return None
+    
+    def list_backup_points(self, backup_dir: str = "backups") -> List[Dict]:
+        """Points of the delta backup chain, oldest first"""
+        return BackupChain(backup_dir).points()
+    
+    def restore_backup_point(self, point: Union[int, str, None] = None, backup_dir: str = "backups") -> bool:
+        """Restore the data as of a point in the delta backup chain (position or file name, latest by default)"""
+        try:
+            return BackupChain(backup_dir).restore(self, point)
+        except Exception as e:
+            print(f"Error restoring backup point: {e}")
+            return False
+    
+    @_exclusive
     def clear_all_data(self) -> bool:
         """Clear all member data (use with caution)"""
         try:
-            self.members = []
+            self._set_members([])
+            self._pending_history = {}
+            self.history.clear()
             return self._save_data()
         except Exception as e:
             print(f"Error clearing data: {e}")
@@ -181,14 +1192,75 @@ class DataManager:
     def export_to_csv(self, csv_file: str = "members_export.csv") -> bool:
         """Export member data to CSV format"""
         try:
-            import pandas as pd
-            
-            if not self.members:
+            if not self.get_member_count():
                 return False
             
-            df = pd.DataFrame(self.members)
-            df.to_csv(csv_file, index=False, encoding='utf-8-sig')
+            write_csv(csv_file, MEMBER_FIELDS, member_field_rows(self.iter_members()))
             return True
         except Exception as e:
             print(f"Error exporting to CSV: {e}")
             return False
+
+
+STORAGE_BACKENDS = ("json", "journal", "sqlite")
+
+# Process-wide managers, keyed by (process id, backend, data file); a forked child
+# must not reuse its parent's manager (or SQLite connection)
+_shared_managers = {}
+_shared_managers_lock = threading.Lock()
+
+
+def create_data_manager(backend: Optional[str] = None, data_file: Optional[str] = None,
+                        shared: bool = True) -> DataManager:
+    """Open the member store for the chosen backend
+
+    ``backend`` defaults to the ``MASJED_STORAGE`` environment variable and
+    then to plain JSON. The SQLite store is migrated once from the JSON
+    data file the first time it is opened. Level rules come from
+    ``level_rules.json`` when present.
+    
+    ``MASJED_DATA_FORMAT`` picks the snapshot format of the JSON stores
+    (``json``, ``compact`` or ``binary``); existing files in another format
+    are still read and are rewritten in the chosen one on the next save.
+    ``MASJED_FLUSH_WINDOW`` (seconds) turns on write-behind for the JSON
+    stores.
+    
+    Managers are shared process-wide, one per backend and data file, so
+    the parsed data, the points index, derived progress and the history
+    offsets survive Streamlit reruns and are kept by every session, and
+    write-behind changes waiting to be flushed are seen by all of them.
+    ``shared=False`` opens a private manager instead (cold-start timing).
+    
+    With ``MASJED_PERF`` set, every store method is timed (see ``perf``).
+    """
+    backend = (backend or os.environ.get("MASJED_STORAGE") or "json").lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    
+    level_rules = load_level_rules()
+    perf.instrument(DataManager, extra=('_load_data', '_save_data', '_append_journal'))
+    
+    def open_store() -> DataManager:
+        if backend == "sqlite":
+            from sqlite_data_manager import SQLiteDataManager
+            perf.instrument(SQLiteDataManager)
+            return SQLiteDataManager(data_file or "members_data.db",
+                                     migrate_from="members_data.json", level_rules=level_rules)
+        snapshot_format = (os.environ.get("MASJED_DATA_FORMAT") or "json").lower()
+        flush_window = float(os.environ.get("MASJED_FLUSH_WINDOW") or 0) or None
+        return DataManager(data_file or "members_data.json", journal=backend == "journal",
+                           level_rules=level_rules, flush_window=flush_window,
+                           snapshot_format=snapshot_format)
+    
+    if not shared:
+        return open_store()
+    
+    default_file = "members_data.db" if backend == "sqlite" else "members_data.json"
+    key = (os.getpid(), backend, os.path.abspath(data_file or default_file))
+    with _shared_managers_lock:
+        if key not in _shared_managers:
+            _shared_managers[key] = open_store()
+        manager = _shared_managers[key]
+    if manager.level_rules.to_dict() != level_rules.to_dict():
+        manager.set_level_rules(level_rules)
+    return manager
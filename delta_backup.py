@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Union
+
+from backup_io import iter_backup_records, write_backup
+
+MANIFEST_FILE = "manifest.json"
+
+
+def record_hash(member: Dict) -> str:
+    """Fingerprint of a member record (without its history)"""
+    record = {k: v for k, v in member.items() if k != 'points_history'}
+    return hashlib.sha1(json.dumps(record, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def entry_hash(entry: Optional[Dict]) -> Optional[str]:
+    """Fingerprint of a history entry (None for no entry)"""
+    if entry is None:
+        return None
+    return hashlib.sha1(json.dumps(entry, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class BackupChain:
+    """Full backups plus small deltas in one directory
+
+    ``manifest.json`` lists every backup point in order; each is either a
+    ``base`` (a full backup in the usual format) or a ``delta`` holding only
+    the members whose record hash changed, the history entries appended
+    since the previous point and the ids of deleted members. The manifest
+    also keeps each member's record hash, history length and a hash of its
+    last history entry as of the last point, which is what the next delta
+    is computed against: a history that was replaced rather than appended
+    to (by a restore or an edit) no longer ends with the same entry and is
+    carried whole. Restoring to a
+    point replays the nearest base at or before it plus the deltas after it.
+    """
+
+    def __init__(self, directory: str = "backups"):
+        self.directory = directory
+
+    def _path(self, file_name: str) -> str:
+        """Path of a file in the backup directory"""
+        return os.path.join(self.directory, file_name)
+
+    def _load_manifest(self) -> Dict:
+        """Backup points and the per-member state of the last one"""
+        try:
+            with open(self._path(MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'points': [], 'state': {}}
+
+    def _save_manifest(self, manifest: Dict):
+        """Atomically replace the manifest"""
+        tmp_path = self._path(f"{MANIFEST_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(MANIFEST_FILE))
+
+    def points(self) -> List[Dict]:
+        """Backup points, oldest first ("file", "kind", "created", "members")"""
+        return self._load_manifest()['points']
+
+    def write(self, data_manager, full_every: int = 24) -> Optional[str]:
+        """Write the next backup point, return its file name
+
+        A full base is written when there is none yet or when ``full_every``
+        deltas have been taken since the last one; otherwise a delta is
+        written. If nothing changed since the last point, nothing is written
+        and that point's file name is returned.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = self._load_manifest()
+        points = manifest['points']
+        bases = [i for i, point in enumerate(points) if point['kind'] == 'base']
+        full = not bases or len(points) - 1 - bases[-1] >= full_every or manifest.get('needs_base', False)
+
+        if full:
+            file_name, state, member_count = self._write_base(data_manager, len(points))
+        else:
+            delta, state = self._collect_delta(data_manager, manifest['state'])
+            if not (delta['upserts'] or delta['deleted'] or delta['history']):
+                return points[-1]['file']
+            file_name = f"{len(points):06d}_delta.json"
+            self._write_file(file_name, delta)
+            member_count = len(state)
+
+        points.append({
+            'file': file_name,
+            'kind': 'base' if full else 'delta',
+            'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'members': member_count
+        })
+        manifest['state'] = state
+        manifest['needs_base'] = False
+        self._save_manifest(manifest)
+        return file_name
+
+    def _write_file(self, file_name: str, payload: Dict):
+        """Atomically write a JSON file to the backup directory"""
+        tmp_path = self._path(f"{file_name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(file_name))
+
+    def _write_base(self, data_manager, seq: int):
+        """Stream a full backup, return (file name, member state, member count)"""
+        file_name = f"{seq:06d}_base.json"
+        state = {}
+
+        def tracked_members():
+            for member in data_manager.iter_members():
+                state[member['id']] = [record_hash(member), 0, None]
+                yield member
+
+        def counted_history(member_id):
+            entry = None
+            for entry in data_manager.iter_member_history_by_id(member_id):
+                state[member_id][1] += 1
+                yield entry
+            state[member_id][2] = entry_hash(entry)
+
+        tmp_path = self._path(f"{file_name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            member_count = write_backup(f, tracked_members(), counted_history)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(file_name))
+        return file_name, state, member_count
+
+    @staticmethod
+    def _collect_delta(data_manager, previous: Dict):
+        """Changes since the state of the last point, return (delta, new state)"""
+        upserts, history, state = [], {}, {}
+        for member in data_manager.iter_members():
+            member_id = member['id']
+            digest = record_hash(member)
+            # Manifests written before the last-entry hash was kept have two fields
+            old_digest, old_count, old_tail = (list(previous.get(member_id, (None, 0, None))) + [None])[:3]
+            if digest != old_digest:
+                upserts.append({k: v for k, v in member.items() if k != 'points_history'})
+
+            # The last entry of the previous point plus anything appended since
+            tail = data_manager.get_member_history_by_id(member_id, old_count - 1) if old_count else []
+            if old_count and (not tail or entry_hash(tail[0]) != old_tail):
+                # History was rewritten (e.g. by a restore): carry it whole
+                entries = list(data_manager.iter_member_history_by_id(member_id))
+                history[member_id] = {'from': 0, 'entries': entries}
+                count, last = len(entries), entries[-1] if entries else None
+            else:
+                appended = tail[1:] if old_count else data_manager.get_member_history_by_id(member_id)
+                if appended:
+                    history[member_id] = {'from': old_count, 'entries': appended}
+                count = old_count + len(appended)
+                read = tail if old_count else appended
+                last = read[-1] if read else None
+            state[member_id] = [digest, count, entry_hash(last)]
+
+        deleted = [member_id for member_id in previous if member_id not in state]
+        delta = {'kind': 'delta', 'upserts': upserts, 'deleted': deleted, 'history': history}
+        return delta, state
+
+    def _resolve_point(self, points: List[Dict], point: Union[int, str, None]) -> int:
+        """Position of a backup point given by position, file name or None (the latest)"""
+        if point is None:
+            point = len(points) - 1
+        elif isinstance(point, str):
+            names = [p['file'] for p in points]
+            if point not in names:
+                raise ValueError(f"Unknown backup point: {point}")
+            point = names.index(point)
+        if not 0 <= point < len(points):
+            raise ValueError(f"Unknown backup point: {point}")
+        return point
+
+    def iter_point_records(self, point: Union[int, str, None] = None) -> Iterator[Dict]:
+        """Members with inline points_history as of a backup point
+
+        Base members are streamed from the base file one at a time; only the
+        (small) deltas are held in memory while merging.
+        """
+        points = self.points()
+        target = self._resolve_point(points, point)
+        base = max(i for i in range(target + 1) if points[i]['kind'] == 'base')
+
+        upserts, deleted, history_ops = {}, set(), {}
+        for entry in points[base + 1:target + 1]:
+            with open(self._path(entry['file']), 'r', encoding='utf-8') as f:
+                delta = json.load(f)
+            for member in delta['upserts']:
+                upserts[member['id']] = member
+            deleted.update(delta['deleted'])
+            for member_id, change in delta['history'].items():
+                history_ops.setdefault(member_id, []).append(change)
+
+        def merged(member_id, history):
+            for change in history_ops.get(member_id, []):
+                history = history[:change['from']] + change['entries']
+            return history
+
+        seen = set()
+        with open(self._path(points[base]['file']), 'r', encoding='utf-8') as f:
+            for member in iter_backup_records(f):
+                member_id = member['id']
+                seen.add(member_id)
+                if member_id in deleted:
+                    continue
+                history = member.pop('points_history', [])
+                member = upserts.get(member_id, member)
+                yield dict(member, points_history=merged(member_id, history))
+
+        for member_id, member in upserts.items():
+            if member_id not in seen and member_id not in deleted:
+                yield dict(member, points_history=merged(member_id, []))
+
+    def restore(self, data_manager, point: Union[int, str, None] = None) -> bool:
+        """Restore a data manager to a backup point (the latest by default)"""
+        tmp_path = self._path("restore.tmp.json")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('[')
+                for i, member in enumerate(self.iter_point_records(point)):
+                    f.write((',\n' if i else '\n') + json.dumps(member, ensure_ascii=False))
+                f.write('\n]\n')
+            if not data_manager.restore_data(tmp_path):
+                return False
+            # Restored history may differ from the tracked state in ways counts
+            # cannot show, so the next point starts a fresh chain
+            manifest = self._load_manifest()
+            manifest['needs_base'] = True
+            self._save_manifest(manifest)
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,129 @@
+import csv
+import io
+import os
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Raw member fields written by DataManager.export_to_csv
+MEMBER_FIELDS = ['id', 'first_name', 'last_name', 'birth_date', 'responsibility',
+                 'description', 'points', 'photo_path']
+
+MEMBERS_REPORT_HEADER = ['نام', 'نام خانوادگی', 'تاریخ تولد', 'مسئولیت', 'توضیحات', 'امتیاز', 'سطح']
+SCORING_REPORT_HEADER = ['رتبه', 'نام و نام خانوادگی', 'امتیاز', 'سطح', 'نشان‌ها', 'تعداد تغییرات']
+HISTORY_REPORT_HEADER = ['نام و نام خانوادگی', 'زمان', 'امتیاز قبلی', 'امتیاز جدید', 'تغییر', 'دلیل']
+
+# Rows are handed to the csv writer in chunks of this many
+CHUNK_ROWS = 500
+
+
+def members_report_rows(data_manager) -> Iterator[List]:
+    """Members report: personal details, points and level, in the order members were added"""
+    for member in data_manager.iter_members():
+        yield [
+            member['first_name'],
+            member['last_name'],
+            member.get('birth_date', ''),
+            member.get('responsibility', ''),
+            member.get('description', ''),
+            member.get('points', 0),
+            data_manager.get_member_progress(member['id'])['level']
+        ]
+
+
+def scoring_report_rows(data_manager) -> Iterator[List]:
+    """Scoring report: leaderboard position, level, badges and number of points changes"""
+    for rank, member in enumerate(data_manager.get_leaderboard(), start=1):
+        progress = data_manager.get_member_progress(member['id'])
+        badges = progress['badges']
+        yield [
+            rank,
+            f"{member['first_name']} {member['last_name']}",
+            member.get('points', 0),
+            progress['level'],
+            ', '.join(b['name'] for b in badges) if badges else 'ندارد',
+            data_manager.get_member_history_count_by_id(member['id'])
+        ]
+
+
+def history_report_rows(data_manager) -> Iterator[List]:
+    """Full points history: one row per change, grouped by member (oldest change first)"""
+    for member in data_manager.iter_members(sort_by='name'):
+        member_name = f"{member['first_name']} {member['last_name']}"
+        for entry in data_manager.iter_member_history_by_id(member['id']):
+            yield [
+                member_name,
+                entry.get('timestamp', ''),
+                entry.get('old_points', ''),
+                entry.get('new_points', ''),
+                entry.get('change', ''),
+                entry.get('reason', '')
+            ]
+
+
+# report name -> (header, row generator)
+REPORTS = {
+    'members': (MEMBERS_REPORT_HEADER, members_report_rows),
+    'scoring': (SCORING_REPORT_HEADER, scoring_report_rows),
+    'history': (HISTORY_REPORT_HEADER, history_report_rows),
+}
+
+
+def iter_csv(header: Sequence, rows: Iterable[Sequence]) -> Iterator[str]:
+    """Render a header and rows as CSV text, one chunk of CHUNK_ROWS rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def write_csv(csv_file: str, header: Sequence, rows: Iterable[Sequence]) -> int:
+    """Stream rows to a ``utf-8-sig`` CSV file (replaced atomically), return the number of data rows"""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    tmp_file = f"{csv_file}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8-sig', newline='') as f:
+            for chunk in iter_csv(header, counted()):
+                f.write(chunk)
+        os.replace(tmp_file, csv_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return count
+
+
+def write_report(data_manager, report: str, csv_file: str) -> int:
+    """Write one of REPORTS to a CSV file, return the number of data rows"""
+    if report not in REPORTS:
+        raise ValueError(f"Unknown report: {report}")
+    header, row_generator = REPORTS[report]
+    return write_csv(csv_file, header, row_generator(data_manager))
+
+
+def member_field_rows(members: Iterable[Dict], fields: Sequence[str] = MEMBER_FIELDS) -> Iterator[Tuple]:
+    """Raw member records as rows of ``fields`` (missing values left empty)"""
+    for member in members:
+        yield tuple(member.get(field, '') for field in fields)
+
+
+def report_bytes(data_manager, report: str) -> bytes:
+    """One of REPORTS rendered in memory as ``utf-8-sig`` CSV, as write_report would write it"""
+    if report not in REPORTS:
+        raise ValueError(f"Unknown report: {report}")
+    header, row_generator = REPORTS[report]
+    return ''.join(iter_csv(header, row_generator(data_manager))).encode('utf-8-sig')
@@ -0,0 +1,93 @@
+import os
+import threading
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are coordinated
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock shared by threads and processes writing the same data file
+
+    Threads of one process serialize on a re-entrant lock; the first holder
+    additionally takes an ``flock`` on the lock file so other processes
+    wait too. Use ``lock_for`` rather than constructing one directly, so all
+    DataManager instances of a process share the lock for a given file.
+
+    The lock file also holds a write generation that writers bump, so a
+    holder can tell for certain whether anyone wrote since it last looked
+    (file size and mtime alone can miss writes within one clock tick).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    def generation(self) -> int:
+        """Current write generation (call while holding the lock)"""
+        try:
+            with open(self.path, 'r', encoding='ascii') as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            # A torn write from a crash: no cached state can match it
+            return -1
+
+    def bump_generation(self) -> int:
+        """Record a write and return the new generation (call while holding the lock)"""
+        generation = max(self.generation(), 0) + 1
+        with open(self.path, 'a+', encoding='ascii') as f:
+            f.seek(0)
+            f.truncate()
+            f.write(str(generation))
+        return generation
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+_locks: Dict[str, FileLock] = {}
+_locks_guard = threading.Lock()
+
+
+def lock_for(path: str) -> FileLock:
+    """The process-wide lock for a lock file path"""
+    key = os.path.abspath(path)
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = FileLock(key)
+        return _locks[key]
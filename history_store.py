@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from typing import List, Dict, Optional, Tuple
+
+
+class HistoryStore:
+    """Append-only points history, kept apart from the member records
+
+    Each member's history is a JSON-lines segment ``<directory>/<member_id>.jsonl``
+    (oldest entry first). Appending a change touches only that member's
+    segment, and ``read`` seeks straight to the requested slice using a
+    per-segment index of line offsets that is extended incrementally as the
+    segment grows, so the member file stays small however long the group has
+    existed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # member_id -> (inode, bytes scanned, start offset of every complete line);
+        # entries are replaced, never changed in place, as readers may hold the old ones
+        self._line_offsets = {}
+        self._offsets_lock = threading.Lock()
+
+    def _path(self, member_id: str) -> str:
+        """Segment file for a member"""
+        if not re.fullmatch(r'[\w-]+', member_id):
+            # Never let an id escape the history directory
+            member_id = hashlib.sha1(member_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{member_id}.jsonl")
+
+    def _offsets(self, member_id: str) -> Tuple[List[int], int]:
+        """Start offsets of the complete lines in a member's segment, and the end of the last one"""
+        path = self._path(member_id)
+        with self._offsets_lock:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._line_offsets.pop(member_id, None)
+                return [], 0
+
+            inode, scanned, offsets = self._line_offsets.get(member_id, (None, 0, []))
+            if inode != st.st_ino or st.st_size < scanned:
+                # Replaced or truncated: scan from scratch
+                scanned, offsets = 0, []
+            if st.st_size > scanned:
+                with open(path, 'rb') as f:
+                    f.seek(scanned)
+                    new_bytes = f.read()
+                new_offsets = []
+                line_start = scanned
+                newline = new_bytes.find(b'\n')
+                while newline != -1:
+                    new_offsets.append(line_start)
+                    line_start = scanned + newline + 1
+                    newline = new_bytes.find(b'\n', newline + 1)
+                # A trailing partial line is left for the next scan
+                scanned = line_start
+                offsets = offsets + new_offsets
+            self._line_offsets[member_id] = (st.st_ino, scanned, offsets)
+            return offsets, scanned
+
+    def append(self, member_id: str, entries: List[Dict], sync: bool = True):
+        """Append history entries to a member's segment (fsynced unless ``sync`` is False)"""
+        if not entries:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        payload = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+        with open(self._path(member_id), 'a', encoding='utf-8') as f:
+            f.write(payload)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def replace(self, member_id: str, entries: List[Dict]):
+        """Overwrite a member's whole history"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(member_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._line_offsets.pop(member_id, None)
+
+    def count(self, member_id: str) -> int:
+        """Number of history entries for a member"""
+        return len(self._offsets(member_id)[0])
+
+    def read(self, member_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Entries ``offset`` .. ``offset + limit`` (oldest first), reading only that slice from disk"""
+        offsets, scanned = self._offsets(member_id)
+        offset = max(0, offset)
+        end = len(offsets) if limit is None else min(len(offsets), offset + max(0, limit))
+        if offset >= end:
+            return []
+
+        start_byte = offsets[offset]
+        end_byte = offsets[end] if end < len(offsets) else scanned
+        with open(self._path(member_id), 'rb') as f:
+            f.seek(start_byte)
+            chunk = f.read(end_byte - start_byte)
+
+        entries = []
+        for line in chunk.splitlines():
+            try:
+                entries.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                # A torn append from a crash; it was never acknowledged
+                continue
+        return entries
+
+    def delete(self, member_id: str):
+        """Remove a member's history"""
+        self._line_offsets.pop(member_id, None)
+        try:
+            os.remove(self._path(member_id))
+        except FileNotFoundError:
+            pass
+
+    def orphans(self, member_ids) -> List[str]:
+        """Segment files belonging to none of the given members"""
+        if not os.path.isdir(self.directory):
+            return []
+        expected = {os.path.basename(self._path(member_id)) for member_id in member_ids}
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.endswith('.jsonl') and name not in expected)
+
+    def clear(self):
+        """Remove every member's history"""
+        self._line_offsets.clear()
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.jsonl'):
+                os.remove(os.path.join(self.directory, name))
+
+    def adopt(self, staging: 'HistoryStore', keep_retired: bool = False):
+        """Swap in a fully written staging store's directory in place of this one
+
+        With ``keep_retired`` the replaced directory is kept until
+        ``discard_retired`` or ``reinstate_retired`` is called.
+        """
+        os.makedirs(staging.directory, exist_ok=True)
+        retired = f"{self.directory}.old"
+        shutil.rmtree(retired, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        os.replace(self.directory, retired)
+        os.replace(staging.directory, self.directory)
+        if not keep_retired:
+            shutil.rmtree(retired, ignore_errors=True)
+        self._line_offsets.clear()
+        staging._line_offsets.clear()
+
+    def discard_retired(self):
+        """Remove the directory kept by ``adopt(..., keep_retired=True)``"""
+        shutil.rmtree(f"{self.directory}.old", ignore_errors=True)
+
+    def reinstate_retired(self):
+        """Undo ``adopt(..., keep_retired=True)``, putting the replaced directory back"""
+        retired = f"{self.directory}.old"
+        if not os.path.isdir(retired):
+            return
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(retired, self.directory)
+        self._line_offsets.clear()
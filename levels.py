@@ -0,0 +1,123 @@
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default rule table: level 1 is reached at 20 points, then every 30 points is one more level
+DEFAULT_FIRST_LEVEL_POINTS = 20
+DEFAULT_POINTS_PER_LEVEL = 30
+DEFAULT_BADGES = [
+    {"level": 1, "name": "آغازگر", "emoji": "🌟", "description": "رسیدن به سطح ۱"},
+    {"level": 3, "name": "پیشرو", "emoji": "⭐", "description": "رسیدن به سطح ۳"},
+    {"level": 5, "name": "فعال", "emoji": "✨", "description": "رسیدن به سطح ۵"},
+    {"level": 10, "name": "نمونه", "emoji": "🏆", "description": "رسیدن به سطح ۱۰"},
+    {"level": 15, "name": "ستاره", "emoji": "💎", "description": "رسیدن به سطح ۱۵"},
+    {"level": 20, "name": "قهرمان", "emoji": "👑", "description": "رسیدن به سطح ۲۰"},
+]
+
+
+class LevelRules:
+    """Rule table turning points into a level, progress within it, and earned badges
+
+    ``first_level_points`` reaches level 1, then every ``points_per_level``
+    points is one more level. ``badges`` lists the badge earned at each level
+    threshold ("level", "name", "emoji", "description").
+    """
+
+    def __init__(self, first_level_points: int = DEFAULT_FIRST_LEVEL_POINTS,
+                 points_per_level: int = DEFAULT_POINTS_PER_LEVEL,
+                 badges: Optional[List[Dict]] = None):
+        if first_level_points <= 0 or points_per_level <= 0:
+            raise ValueError("Level thresholds must be positive")
+        self.first_level_points = first_level_points
+        self.points_per_level = points_per_level
+        self.badges = sorted(DEFAULT_BADGES if badges is None else badges, key=lambda b: b['level'])
+
+    def to_dict(self) -> Dict:
+        """Rule table as stored in level_rules.json"""
+        return {
+            'first_level_points': self.first_level_points,
+            'points_per_level': self.points_per_level,
+            'badges': self.badges
+        }
+
+    def level_info(self, points: int) -> Tuple[int, int, int]:
+        """Calculate level, points within the level and points needed for the next one"""
+        if points < self.first_level_points:
+            return 0, points, self.first_level_points
+        level = 1 + (points - self.first_level_points) // self.points_per_level
+        points_in_level = (points - self.first_level_points) % self.points_per_level
+        return level, points_in_level, self.points_per_level
+
+    def badges_for(self, level: int) -> List[Dict]:
+        """Achievement badges earned at a level"""
+        return [{k: badge[k] for k in ('name', 'emoji', 'description')}
+                for badge in self.badges if level >= badge['level']]
+
+    def progress(self, points: int) -> Dict:
+        """All derived fields for a points total"""
+        level, points_in_level, points_for_next = self.level_info(points)
+        return {
+            'level': level,
+            'points_in_level': points_in_level,
+            'points_for_next': points_for_next,
+            'badges': self.badges_for(level)
+        }
+
+    def progress_bulk(self, points: Sequence[int]) -> List[Dict]:
+        """Derived fields for a whole roster at once (vectorized with NumPy when available)"""
+        try:
+            import numpy as np
+        except ImportError:
+            return [self.progress(p) for p in points]
+
+        values = np.asarray(points, dtype=np.int64)
+        above = values - self.first_level_points
+        reached = above >= 0
+        levels = np.where(reached, 1 + above // self.points_per_level, 0)
+        in_level = np.where(reached, above % self.points_per_level, values)
+        for_next = np.where(reached, self.points_per_level, self.first_level_points)
+
+        # Badge lists depend only on the level, so build one per distinct level
+        badges = {int(level): self.badges_for(int(level)) for level in np.unique(levels)}
+        return [
+            {'level': int(level), 'points_in_level': int(p_in), 'points_for_next': int(p_next),
+             'badges': badges[int(level)]}
+            for level, p_in, p_next in zip(levels, in_level, for_next)
+        ]
+
+    def level_min_points(self, level: int) -> int:
+        """Fewest points that reach a level"""
+        if level <= 0:
+            return 0
+        return self.first_level_points + (level - 1) * self.points_per_level
+
+    def points_range(self, min_level: int, max_level: Optional[int] = None) -> Tuple[int, Optional[int]]:
+        """Inclusive points range covering levels min_level..max_level (open-ended when max_level is None)"""
+        low = self.level_min_points(min_level)
+        high = None if max_level is None else self.level_min_points(max_level + 1) - 1
+        return low, high
+
+
+DEFAULT_LEVEL_RULES = LevelRules()
+
+
+def load_level_rules(rules_file: str = "level_rules.json") -> LevelRules:
+    """Load the rule table from a JSON file, falling back to the defaults"""
+    try:
+        if os.path.exists(rules_file):
+            with open(rules_file, 'r', encoding='utf-8') as f:
+                return LevelRules(**json.load(f))
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
+        print(f"Error loading level rules: {e}")
+    return DEFAULT_LEVEL_RULES
+
+
+def save_level_rules(rules: LevelRules, rules_file: str = "level_rules.json") -> bool:
+    """Store the rule table as JSON"""
+    try:
+        with open(rules_file, 'w', encoding='utf-8') as f:
+            json.dump(rules.to_dict(), f, ensure_ascii=False, indent=2)
+        return True
+    except Exception as e:
+        print(f"Error saving level rules: {e}")
+        return False
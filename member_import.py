@@ -0,0 +1,176 @@
+import os
+from typing import Dict, Iterator, List, Optional, Set
+
+from data_manager import PERSIAN_NAME_MAP, normalize_name
+
+# Rows read and validated per step
+CHUNK_ROWS = 5000
+
+# Accepted column headers -> member field; the members report's headers are accepted too,
+# so an exported roster can be imported elsewhere
+COLUMN_ALIASES = {
+    'first_name': 'first_name', 'نام': 'first_name',
+    'last_name': 'last_name', 'نام خانوادگی': 'last_name',
+    'birth_date': 'birth_date', 'تاریخ تولد': 'birth_date',
+    'responsibility': 'responsibility', 'مسئولیت': 'responsibility',
+    'description': 'description', 'توضیحات': 'description',
+    'points': 'points', 'امتیاز': 'points',
+}
+REQUIRED_COLUMNS = ('first_name', 'last_name')
+TEXT_COLUMNS = ('first_name', 'last_name', 'responsibility', 'description')
+
+# Arabic letter forms stored as their Persian ones; unlike matching (PERSIAN_NAME_MAP)
+# the zero-width non-joiner is kept, as it is part of how names are spelled
+LETTERS_MAP = str.maketrans({'ي': 'ی', 'ى': 'ی', 'ك': 'ک', '\u200f': None})
+
+# Persian and Arabic-Indic digits -> ASCII
+DIGITS_MAP = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+
+def read_roster(source, file_name: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> Iterator:
+    """DataFrames of at most ``chunk_rows`` rows (all values as text) from a CSV or Excel roster
+
+    ``source`` is a path or a binary file object; ``file_name`` (defaulting
+    to the path) tells Excel from CSV. Row labels are 0-based data row
+    numbers, so a row is at line ``label + 2`` of a CSV with a header.
+    """
+    import pandas as pd
+
+    name = file_name or (source if isinstance(source, str) else getattr(source, 'name', ''))
+    if os.path.splitext(name)[1].lower() in EXCEL_EXTENSIONS:
+        # Excel files cannot be read in chunks; slice the sheet instead
+        frame = pd.read_excel(source, dtype=str, keep_default_na=False)
+        for start in range(0, len(frame), chunk_rows):
+            yield frame.iloc[start:start + chunk_rows]
+        return
+    yield from pd.read_csv(source, dtype=str, keep_default_na=False, encoding='utf-8-sig',
+                           chunksize=chunk_rows)
+
+
+def normalize_chunk(frame):
+    """Rename, normalize and validate one roster chunk, return (clean frame, {row: error})
+
+    Everything is done column-wise: text gets Persian letters and single
+    spaces, digits become ASCII, dates become YYYY-MM-DD (as typed, and
+    only if that is a real calendar date) and points whole numbers; a
+    missing date is left empty. Rows with a problem are
+    left out of the clean frame and reported by row label.
+    """
+    import pandas as pd
+
+    frame = frame.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip().lower(), str(c).strip()))
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    # A roster with both the English and the Persian header keeps the first
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+    frame = frame[[column for column in dict.fromkeys(COLUMN_ALIASES.values()) if column in frame.columns]].copy()
+
+    for column in TEXT_COLUMNS:
+        if column in frame:
+            frame[column] = frame[column].astype(str).str.translate(LETTERS_MAP).str.split().str.join(' ')
+        else:
+            frame[column] = ''
+
+    errors: Dict[int, str] = {}
+
+    def reject(mask, message):
+        for row in frame.index[mask]:
+            errors.setdefault(row, message)
+
+    reject(frame['first_name'] == '', "first name is empty")
+    reject(frame['last_name'] == '', "last name is empty")
+
+    if 'birth_date' in frame:
+        dates = (frame['birth_date'].astype(str).str.translate(DIGITS_MAP).str.strip()
+                 .str.replace('/', '-', regex=False).str.replace('.', '-', regex=False))
+        parts = dates.str.extract(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+        padded = parts[0] + '-' + parts[1].str.zfill(2) + '-' + parts[2].str.zfill(2)
+        # Only dates the member page can parse back (so 1390-02-30 is refused, whatever the calendar)
+        valid = pd.to_datetime(padded, format='%Y-%m-%d', errors='coerce').notna()
+        reject((dates != '') & ~valid, "birth date is not a valid YYYY-MM-DD date")
+        frame['birth_date'] = padded.where(valid, '')
+    else:
+        frame['birth_date'] = ''
+
+    if 'points' in frame:
+        text = frame['points'].astype(str).str.translate(DIGITS_MAP).str.strip()
+        points = pd.to_numeric(text.where(text != '', '0'), errors='coerce')
+        bad = points.isna() | (points < 0) | (points % 1 != 0)
+        reject(bad, "points must be a whole number of at least 0")
+        frame['points'] = points.where(~bad, 0).astype(int)
+    else:
+        frame['points'] = 0
+
+    return frame.drop(index=list(errors)), errors
+
+
+def existing_name_index(data_manager) -> Dict[str, Set[str]]:
+    """Normalized full name -> birth dates ('' when unknown) of the members already stored"""
+    index: Dict[str, Set[str]] = {}
+    for member in data_manager.iter_members():
+        name = normalize_name(f"{member.get('first_name', '')} {member.get('last_name', '')}")
+        index.setdefault(name, set()).add(member.get('birth_date') or '')
+    return index
+
+
+def is_duplicate(index: Dict[str, Set[str]], name: str, birth_date: str) -> bool:
+    """Same name, and the birth dates agree or one of them is unknown"""
+    dates = index.get(name)
+    return bool(dates) and (not birth_date or '' in dates or birth_date in dates)
+
+
+def import_members(data_manager, source, file_name: Optional[str] = None, chunk_rows: int = CHUNK_ROWS,
+                   dry_run: bool = False) -> Dict:
+    """Import a CSV or Excel roster, adding every valid new member with a single write
+
+    Rows are read and validated ``chunk_rows`` at a time. A row is skipped
+    as a duplicate if a member (already stored, or earlier in the file)
+    has the same normalized name and a compatible birth date. Returns
+    ``rows``, ``added`` (what would be added, with ``dry_run``), ``duplicates`` and ``errors`` (the last two as
+    (line number, text) pairs, line 1 being the header). Raises
+    ValueError for a file that cannot be read as a roster.
+    """
+    name_index = existing_name_index(data_manager)
+    new_members: List[Dict] = []
+    duplicates, errors = [], []
+    rows = 0
+
+    try:
+        chunks = read_roster(source, file_name, chunk_rows)
+        for chunk in chunks:
+            rows += len(chunk)
+            clean, chunk_errors = normalize_chunk(chunk)
+            errors.extend((row + 2, message) for row, message in sorted(chunk_errors.items()))
+
+            # The same key normalize_name gives, computed for the whole chunk at once
+            full_names = ((clean['first_name'] + ' ' + clean['last_name'])
+                          .str.translate(PERSIAN_NAME_MAP).str.split().str.join(' '))
+            # Only rows whose name is already known, or repeated in this chunk, need a closer look
+            candidates = full_names.isin(list(name_index)) | full_names.duplicated(keep=False)
+            for row, member in zip(clean.index, clean.to_dict('records')):
+                name = full_names[row]
+                if candidates[row] and is_duplicate(name_index, name, member['birth_date']):
+                    duplicates.append((row + 2, name))
+                    continue
+                name_index.setdefault(name, set()).add(member['birth_date'])
+                member['points'] = int(member['points'])
+                # An unknown birth date is stored as None
+                member['birth_date'] = member['birth_date'] or None
+                member['photo_path'] = None
+                new_members.append(member)
+    except ImportError as e:
+        raise ValueError(f"Reading this file needs an extra package: {e}") from e
+    except (UnicodeDecodeError, KeyError) as e:
+        raise ValueError(f"Could not read the roster: {e}") from e
+
+    if new_members and not dry_run and not data_manager.add_members(new_members):
+        raise ValueError("Saving the imported members failed")
+    return {
+        'rows': rows,
+        'added': len(new_members),
+        'duplicates': duplicates,
+        'errors': errors
+    }
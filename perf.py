@@ -0,0 +1,156 @@
+import functools
+import json
+import os
+import threading
+import time
+import types
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Opt-in: nothing is wrapped or recorded unless MASJED_PERF is set
+ENABLED = os.environ.get("MASJED_PERF", "").lower() not in ("", "0", "false", "no")
+
+_metrics: Dict[str, Dict] = {}
+_metrics_lock = threading.Lock()
+# Per-thread tallies for the rerun in progress (Streamlit runs each session's script in its own thread)
+_current = threading.local()
+
+
+def enabled() -> bool:
+    return ENABLED
+
+
+def observe(name: str, value: float, unit: str = "s"):
+    """Add one sample to a metric (a duration in seconds, a byte count, ...)"""
+    if not ENABLED:
+        return
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = {'unit': unit, 'count': 0, 'total': 0.0, 'max': 0.0}
+        metric['count'] += 1
+        metric['total'] += value
+        metric['max'] = max(metric['max'], value)
+
+
+@contextmanager
+def timer(name: str):
+    """Time a block as a sample of ``name``"""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def note_reload():
+    """Count a re-read of the data from disk against the current rerun"""
+    if not ENABLED:
+        return
+    observe("reloads", 1, "count")
+    if getattr(_current, 'reloads', None) is not None:
+        _current.reloads += 1
+
+
+def start_rerun():
+    """Mark the start of a script rerun in this thread"""
+    if not ENABLED:
+        return
+    _current.started = time.perf_counter()
+    _current.reloads = 0
+
+
+def finish_rerun(page: str):
+    """Record the duration of the rerun started in this thread and the data reloads it caused"""
+    if not ENABLED or getattr(_current, 'started', None) is None:
+        return
+    observe(f"page.{page}", time.perf_counter() - _current.started)
+    observe(f"page.{page}.reloads", _current.reloads, "count")
+    _current.started = _current.reloads = None
+
+
+def _timed(name: str, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            observe(name, time.perf_counter() - start)
+    wrapper.__perf_timed__ = True
+    return wrapper
+
+
+def _timed_generator(name: str, method):
+    """Like _timed for a generator function: counts the time spent producing items, not creating it"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        generator = method(*args, **kwargs)
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            # Also when the consumer stops early
+            generator.close()
+            observe(name, elapsed)
+    wrapper.__perf_timed__ = True
+    return wrapper
+
+
+def instrument(cls, extra: Iterable[str] = ()):
+    """Time every public method of a class (plus the named private ones), once
+
+    Methods are wrapped on the class itself, so every instance, existing or
+    future, is timed as ``<class>.<method>``. Generator methods are timed
+    over the whole iteration (time spent in the consumer excluded). A no-op
+    unless enabled.
+    """
+    if not ENABLED or cls.__dict__.get('__perf_instrumented__'):
+        return cls
+    import inspect
+    for name in dir(cls):
+        if name.startswith('_') and name not in extra:
+            continue
+        # Only plain functions: static and class methods keep their binding
+        method = inspect.getattr_static(cls, name)
+        if not isinstance(method, types.FunctionType) or getattr(method, '__perf_timed__', False):
+            continue
+        timed = _timed_generator if inspect.isgeneratorfunction(method) else _timed
+        setattr(cls, name, timed(f"{cls.__name__}.{name}", method))
+    cls.__perf_instrumented__ = True
+    return cls
+
+
+def snapshot() -> List[Dict]:
+    """Every metric with its count, total, mean and max, slowest total first"""
+    with _metrics_lock:
+        rows = [dict(name=name, mean=metric['total'] / metric['count'] if metric['count'] else 0.0, **metric)
+                for name, metric in _metrics.items()]
+    return sorted(rows, key=lambda row: (row['unit'] != 's', -row['total']))
+
+
+def reset():
+    """Forget everything recorded so far"""
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def dump(path: Optional[str] = None) -> str:
+    """Write the current metrics as JSON, return the file path"""
+    path = path or f"perf_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    payload = {'created': datetime.now().isoformat(timespec='seconds'), 'metrics': snapshot()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import perf
+
+# Widths (px) member photos are shown at: list rows and the edit form
+THUMBNAIL_WIDTHS = (100, 150)
+
+PHOTO_EXTENSIONS = ('png', 'jpg', 'jpeg')
+
+# Files younger than this are never collected, so an upload whose member
+# has not been saved yet is not mistaken for an orphan
+GC_GRACE_SECONDS = 3600
+
+
+class PhotoStore:
+    """Content-addressed member photos with pre-built thumbnails
+
+    An upload is stored once as ``<directory>/<sha256>.<ext>`` however many
+    times it is uploaded, and a thumbnail per width in THUMBNAIL_WIDTHS is
+    written next to it under ``thumbs/`` at upload time. Thumbnails are served
+    from an in-memory LRU so reruns do not re-read images from disk. Pillow is
+    only needed to build thumbnails; without it the original is served.
+    """
+
+    def __init__(self, directory: str = "member_photos", cache_entries: int = 512):
+        self.directory = directory
+        self.thumbs_directory = os.path.join(directory, "thumbs")
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, data: bytes, extension: str) -> str:
+        """Store photo bytes (deduplicated by content) and build its thumbnails, return its path"""
+        extension = extension.lower().lstrip('.')
+        if extension not in PHOTO_EXTENSIONS:
+            raise ValueError(f"Unsupported photo type: {extension}")
+        if extension == 'jpeg':
+            extension = 'jpg'
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.directory, f"{digest}.{extension}")
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        else:
+            # Refresh the mtime so a re-upload is covered by the GC grace period
+            os.utime(path)
+
+        for width in THUMBNAIL_WIDTHS:
+            self._build_thumbnail(path, width)
+        return path
+
+    def _thumbnail_path(self, photo_path: str, width: int) -> str:
+        """Where the thumbnail of a photo at a width is kept"""
+        name, extension = os.path.splitext(os.path.basename(photo_path))
+        return os.path.join(self.thumbs_directory, f"{name}_{width}{extension}")
+
+    def _build_thumbnail(self, photo_path: str, width: int) -> Optional[str]:
+        """Write the thumbnail of a photo at a width if missing, return its path"""
+        thumb_path = self._thumbnail_path(photo_path, width)
+        if os.path.exists(thumb_path):
+            return thumb_path
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+
+        try:
+            with Image.open(photo_path) as image:
+                image_format = image.format or 'PNG'
+                if image.width > width:
+                    height = max(1, round(image.height * width / image.width))
+                    image = image.resize((width, height), Image.LANCZOS)
+                if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                os.makedirs(self.thumbs_directory, exist_ok=True)
+                tmp_path = f"{thumb_path}.tmp"
+                image.save(tmp_path, format=image_format, quality=85)
+            os.replace(tmp_path, thumb_path)
+            return thumb_path
+        except Exception as e:
+            print(f"Error building thumbnail: {e}")
+            return None
+
+    def thumbnail(self, photo_path: Optional[str], width: int) -> Optional[bytes]:
+        """Image bytes to show a photo at a width (None if the photo is missing)"""
+        if not photo_path:
+            return None
+        key = (photo_path, width)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        data = None
+        if os.path.exists(photo_path):
+            # Photos from before the store (or added without Pillow) get their thumbnail now
+            source = self._build_thumbnail(photo_path, width) or photo_path
+            with open(source, 'rb') as f:
+                data = f.read()
+            perf.observe("PhotoStore.read_bytes", len(data), "bytes")
+
+        if data is None:
+            return None
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return data
+
+    def collect_garbage(self, referenced_paths: Iterable[Optional[str]],
+                        grace_seconds: float = GC_GRACE_SECONDS) -> List[str]:
+        """Remove photos (and their thumbnails) no member refers to, return the removed paths"""
+        if not os.path.isdir(self.directory):
+            return []
+        referenced = {os.path.normpath(path) for path in referenced_paths if path}
+        cutoff = time.time() - grace_seconds
+        removed = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path) or os.path.normpath(path) in referenced:
+                continue
+            if name.rsplit('.', 1)[-1].lower() not in PHOTO_EXTENSIONS or os.path.getmtime(path) > cutoff:
+                continue
+            for width in THUMBNAIL_WIDTHS:
+                thumb_path = self._thumbnail_path(path, width)
+                if os.path.exists(thumb_path):
+                    os.remove(thumb_path)
+            os.remove(path)
+            removed.append(path)
+
+        if removed:
+            removed_set = set(removed)
+            with self._lock:
+                for key in [key for key in self._cache if key[0] in removed_set]:
+                    del self._cache[key]
+        return removed
+
+    def cache_stats(self) -> Dict:
+        """Thumbnail cache occupancy"""
+        with self._lock:
+            return {'entries': len(self._cache), 'bytes': sum(len(v) for v in self._cache.values())}
+
+
+_stores: Dict[str, PhotoStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_photo_store(directory: str = "member_photos") -> PhotoStore:
+    """Process-wide photo store for a directory, so its thumbnail cache outlives reruns"""
+    perf.instrument(PhotoStore)
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = PhotoStore(directory)
+        return _stores[directory]
@@ -0,0 +1,89 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class PointsIndex:
+    """Members ordered by points (highest first), maintained incrementally
+
+    Keys are ``(-points, seq, member_id)`` kept in a sorted list, where ``seq``
+    is the member's insertion order so ties rank the same way the stable
+    ``sorted(..., reverse=True)`` leaderboard always did. Rank, percentile and
+    range queries are binary searches (O(log n)); a points change removes and
+    re-inserts one key (O(log n) search plus a memmove of the list tail).
+    """
+
+    def __init__(self, members: Iterable[Tuple[str, int]] = ()):
+        self._keys: List[Tuple[int, int, str]] = []
+        self._key_of: Dict[str, Tuple[int, int, str]] = {}
+        self._next_seq = 0
+        for member_id, points in members:
+            key = (-points, self._next_seq, member_id)
+            self._keys.append(key)
+            self._key_of[member_id] = key
+            self._next_seq += 1
+        self._keys.sort()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, member_id: str) -> bool:
+        return member_id in self._key_of
+
+    def add(self, member_id: str, points: int):
+        """Insert a new member (ranked after existing members with equal points)"""
+        if member_id in self._key_of:
+            self.update(member_id, points)
+            return
+        key = (-points, self._next_seq, member_id)
+        self._next_seq += 1
+        insort(self._keys, key)
+        self._key_of[member_id] = key
+
+    def update(self, member_id: str, points: int):
+        """Move a member to its new points position"""
+        old_key = self._key_of.get(member_id)
+        if old_key is None:
+            self.add(member_id, points)
+            return
+        if old_key[0] == -points:
+            return
+        del self._keys[bisect_left(self._keys, old_key)]
+        key = (-points, old_key[1], member_id)
+        insort(self._keys, key)
+        self._key_of[member_id] = key
+
+    def remove(self, member_id: str):
+        """Drop a member"""
+        key = self._key_of.pop(member_id, None)
+        if key is not None:
+            del self._keys[bisect_left(self._keys, key)]
+
+    def top(self, k: Optional[int] = None) -> List[str]:
+        """Ids of the k highest-ranked members (all members when k is None)"""
+        keys = self._keys if k is None else self._keys[:max(0, k)]
+        return [key[2] for key in keys]
+
+    def rank(self, member_id: str) -> Optional[int]:
+        """1-based leaderboard position of a member"""
+        key = self._key_of.get(member_id)
+        if key is None:
+            return None
+        return bisect_left(self._keys, key) + 1
+
+    def count_below(self, points: int) -> int:
+        """Number of members with fewer than ``points`` points"""
+        # Keys with -p > -points, i.e. starting at the first key of (-points + 1, ...)
+        return len(self._keys) - bisect_left(self._keys, (-points + 1,))
+
+    def percentile(self, member_id: str) -> Optional[float]:
+        """Share of members (0-100) with fewer points than this member"""
+        key = self._key_of.get(member_id)
+        if key is None:
+            return None
+        return 100.0 * self.count_below(-key[0]) / len(self._keys)
+
+    def in_points_range(self, min_points: int, max_points: Optional[int] = None) -> List[str]:
+        """Ids of members with min_points <= points <= max_points, highest first"""
+        start = 0 if max_points is None else bisect_left(self._keys, (-max_points,))
+        end = bisect_left(self._keys, (-min_points + 1,))
+        return [key[2] for key in self._keys[start:end]]
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List
+
+# Snapshot formats DataManager can write; any of them is recognized on load
+SNAPSHOT_FORMATS = ('json', 'compact', 'binary')
+
+BINARY_MAGIC = b'MSJB'
+BINARY_VERSION = 1
+
+# magic, format version, member count, length of the JSON column table
+_HEADER = struct.Struct('<4sHII')
+_LENGTH = struct.Struct('<Q')
+
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+# Separates the values of a text column; JSON text never contains it raw
+_SEPARATOR = '\x00'
+
+# Stands for a field a member does not have
+_MISSING = object()
+
+
+class SnapshotFormatError(ValueError):
+    """A data file that is not a snapshot in any known format"""
+
+
+def detect_format(raw: bytes) -> str:
+    """Format of an encoded snapshot ('binary' or 'json')"""
+    return 'binary' if raw[:len(BINARY_MAGIC)] == BINARY_MAGIC else 'json'
+
+
+def encode_members(members: List[Dict], snapshot_format: str = 'json') -> bytes:
+    """Serialize member records in one of SNAPSHOT_FORMATS"""
+    if snapshot_format == 'json':
+        return json.dumps(members, ensure_ascii=False, indent=2).encode('utf-8')
+    if snapshot_format == 'compact':
+        return json.dumps(members, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if snapshot_format == 'binary':
+        return _encode_binary(members)
+    raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+
+
+def decode_members(raw: bytes) -> List[Dict]:
+    """Member records from a snapshot in any of SNAPSHOT_FORMATS"""
+    if detect_format(raw) == 'binary':
+        return _decode_binary(raw)
+    if not raw.strip():
+        return []
+    data = json.loads(raw.decode('utf-8'))
+    return data if isinstance(data, list) else []
+
+
+def _column_type(values: list) -> str:
+    """Cheapest column type that holds every present, non-null value exactly"""
+    if all(type(v) is int and _INT64_MIN <= v <= _INT64_MAX for v in values):
+        return 'int'
+    if all(type(v) is str and _SEPARATOR not in v for v in values):
+        return 'str'
+    return 'json'
+
+
+def _encode_binary(members: List[Dict]) -> bytes:
+    """Columnar binary snapshot
+
+    After the header comes a JSON table with one entry per field (in
+    first-seen order): its name, type, and the rows where it is null or
+    absent. Then one block per column, prefixed with its byte length:
+    little-endian int64s for 'int' columns, separator-joined UTF-8 for 'str'
+    columns and a JSON array for anything else. Null and absent rows hold a
+    placeholder in the block.
+    """
+    names = list(dict.fromkeys(name for member in members for name in member))
+    columns, blocks = [], []
+    for name in names:
+        values = [member.get(name, _MISSING) for member in members]
+        absent = [row for row, v in enumerate(values) if v is _MISSING]
+        nulls = [row for row, v in enumerate(values) if v is None]
+        column_type = _column_type([v for v in values if v is not _MISSING and v is not None])
+        if column_type == 'int':
+            block = array('q', [v if type(v) is int else 0 for v in values])
+            if sys.byteorder != 'little':
+                block.byteswap()
+            block = block.tobytes()
+        elif column_type == 'str':
+            block = _SEPARATOR.join(v if type(v) is str else '' for v in values).encode('utf-8')
+        else:
+            block = json.dumps([None if v is _MISSING else v for v in values],
+                               ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        columns.append([name, column_type, nulls if column_type != 'json' else [], absent])
+        blocks.append(_LENGTH.pack(len(block)) + block)
+
+    table = json.dumps(columns, ensure_ascii=False).encode('utf-8')
+    header = _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(members), len(table))
+    return b''.join([header, table] + blocks)
+
+
+def _decode_binary(raw: bytes) -> List[Dict]:
+    """Member records from a columnar binary snapshot"""
+    try:
+        magic, version, count, table_length = _HEADER.unpack_from(raw)
+        if version != BINARY_VERSION:
+            raise SnapshotFormatError(f"Unsupported binary snapshot version: {version}")
+        offset = _HEADER.size
+        columns = json.loads(raw[offset:offset + table_length].decode('utf-8'))
+        offset += table_length
+
+        names, values, sparse = [], [], False
+        for name, column_type, nulls, absent in columns:
+            (length,) = _LENGTH.unpack_from(raw, offset)
+            offset += _LENGTH.size
+            block = raw[offset:offset + length]
+            offset += length
+            if len(block) != length:
+                raise SnapshotFormatError("Binary snapshot is truncated")
+
+            if column_type == 'int':
+                column = array('q')
+                column.frombytes(block)
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                column = column.tolist()
+            elif column_type == 'str':
+                column = block.decode('utf-8').split(_SEPARATOR) if count else []
+            elif column_type == 'json':
+                column = json.loads(block.decode('utf-8'))
+            else:
+                raise SnapshotFormatError(f"Unknown column type: {column_type}")
+            if len(column) != count:
+                raise SnapshotFormatError(f"Column '{name}' has {len(column)} values, expected {count}")
+            for row in nulls:
+                column[row] = None
+            for row in absent:
+                column[row] = _MISSING
+            sparse = sparse or bool(absent)
+            names.append(name)
+            values.append(column)
+    except (struct.error, UnicodeDecodeError, json.JSONDecodeError, IndexError, TypeError) as e:
+        raise SnapshotFormatError(f"Corrupt binary snapshot: {e}") from e
+
+    members = [dict(zip(names, row)) for row in zip(*values)] if names else [{} for _ in range(count)]
+    if sparse:
+        # Drop the placeholders of fields a member did not have
+        members = [{k: v for k, v in member.items() if v is not _MISSING} for member in members]
+    return members
+
+
+def convert_file(source: str, snapshot_format: str, target: str = None) -> int:
+    """Rewrite a data file in another snapshot format (in place by default), return the member count
+
+    Only use this on a data file no DataManager is writing to; a running
+    store converts itself with ``DataManager.convert_format``.
+    """
+    with open(source, 'rb') as f:
+        members = decode_members(f.read())
+    raw = encode_members(members, snapshot_format)
+    target = target or source
+    tmp_path = f"{target}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, target)
+    return len(members)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convert a member data file between snapshot formats")
+    parser.add_argument("source")
+    parser.add_argument("format", choices=SNAPSHOT_FORMATS)
+    parser.add_argument("--output", help="write here instead of replacing the source")
+    args = parser.parse_args(argv)
+    try:
+        count = convert_file(args.source, args.format, args.output)
+    except (OSError, ValueError) as e:
+        print(f"Error converting data file: {e}")
+        return 1
+    print(f"{count} members written as {args.format}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
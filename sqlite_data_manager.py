@@ -0,0 +1,611 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, TextIO, Tuple
+
+from backup_io import iter_backup_records
+from data_manager import DataManager, MEMBER_SORT_KEYS, new_member_id
+from levels import DEFAULT_LEVEL_RULES, LevelRules
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT,
+    first_name TEXT NOT NULL DEFAULT '',
+    last_name TEXT NOT NULL DEFAULT '',
+    points INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_members_points ON members (points DESC, id);
+CREATE INDEX IF NOT EXISTS idx_members_name ON members (last_name, first_name);
+
+CREATE TABLE IF NOT EXISTS points_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    member_id INTEGER NOT NULL REFERENCES members (id) ON DELETE CASCADE,
+    timestamp TEXT NOT NULL,
+    old_points INTEGER NOT NULL DEFAULT 0,
+    new_points INTEGER NOT NULL DEFAULT 0,
+    change INTEGER NOT NULL DEFAULT 0,
+    reason TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_history_member ON points_history (member_id, id);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON points_history (timestamp);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('store_version', 0);
+"""
+
+HISTORY_FIELDS = ('timestamp', 'old_points', 'new_points', 'change', 'reason')
+
+MEMBER_ORDER_BY = {
+    'added': "id",
+    'name': "last_name, first_name, id",
+    'points_desc': "points DESC, id",
+    'points_asc': "points, id",
+}
+
+
+class SQLiteDataManager(DataManager):
+    """DataManager backed by an SQLite database
+
+    Members live in an indexed ``members`` table (the full record is kept as
+    JSON in ``data``; name and points are mirrored into indexed columns) and
+    ``points_history`` is its own table, so single-member updates, history
+    pages and leaderboards touch only the rows they need. Members are
+    addressed by their stable ``id`` (the unique ``uid`` column); indexes keep
+    the same meaning as in the JSON store: position in insertion order.
+    """
+
+    def __init__(self, db_file: str = "members_data.db", migrate_from: Optional[str] = None,
+                 level_rules: Optional[LevelRules] = None):
+        self.data_file = db_file
+        self.level_rules = level_rules or DEFAULT_LEVEL_RULES
+        self.journal = False
+        self.data_version = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.tail_replays = 0
+        self._lock = threading.RLock()
+
+        is_new = not os.path.exists(db_file)
+        self._conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        if not self._schema_ready():
+            # Only a new or older database needs the write lock to open
+            self._conn.executescript(SCHEMA)
+            self._ensure_member_ids()
+
+        if is_new and migrate_from and os.path.exists(migrate_from):
+            migrated = self.import_json(migrate_from)
+            print(f"Migrated {migrated} members from {migrate_from} to {db_file}")
+
+    @property
+    def members(self) -> List[Dict]:
+        """All members, for code written against the JSON store's attribute"""
+        return self.get_all_members()
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database write lock up front
+
+        ``BEGIN IMMEDIATE`` makes other connections (other sessions or
+        processes) wait, so the reads a change is based on cannot go stale
+        before it commits.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            changes = self._conn.total_changes
+            try:
+                yield
+            except BaseException:
+                self._conn.rollback()
+                raise
+            if self._conn.total_changes != changes:
+                # Every connection sees the bump, unlike PRAGMA data_version
+                self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'store_version'")
+            self._conn.commit()
+
+    def _schema_ready(self) -> bool:
+        """Whether the database already has the current schema and every member an id (read-only check)"""
+        names = {row['name'] for row in self._conn.execute("SELECT name FROM sqlite_master")}
+        if not {'members', 'points_history', 'meta', 'idx_members_uid', 'idx_history_timestamp'} <= names:
+            return False
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(members)")}
+        if not {'uid', 'version'} <= columns:
+            return False
+        return self._conn.execute("SELECT 1 FROM members WHERE uid IS NULL LIMIT 1").fetchone() is None
+
+    def _ensure_member_ids(self):
+        """Add the uid and version columns to older databases and backfill ids for members without one"""
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(members)")}
+        with self._transaction():
+            if 'uid' not in columns:
+                self._conn.execute("ALTER TABLE members ADD COLUMN uid TEXT")
+            if 'version' not in columns:
+                self._conn.execute("ALTER TABLE members ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            rows = self._conn.execute("SELECT id, data FROM members WHERE uid IS NULL").fetchall()
+            for row in rows:
+                record = json.loads(row['data'])
+                record['id'] = record.get('id') or new_member_id()
+                self._conn.execute(
+                    "UPDATE members SET uid = ?, data = ? WHERE id = ?",
+                    (record['id'], json.dumps(record, ensure_ascii=False), row['id'])
+                )
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_members_uid ON members (uid)")
+
+    # ------------------------------------------------------------------
+    # Row helpers
+    # ------------------------------------------------------------------
+
+    def _id_at(self, index: int) -> Optional[str]:
+        """Id of the member at a list position"""
+        if index < 0:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uid FROM members ORDER BY id LIMIT 1 OFFSET ?", (index,)
+            ).fetchone()
+        return row['uid'] if row else None
+
+    def _row_id(self, member_id: str) -> Optional[int]:
+        """Row id for a member id"""
+        row = self._conn.execute("SELECT id FROM members WHERE uid = ?", (member_id,)).fetchone()
+        return row['id'] if row else None
+
+    @staticmethod
+    def _member_columns(member_data: Dict) -> tuple:
+        """Indexed columns and JSON body for a member record (history is stored separately)"""
+        record = {k: v for k, v in member_data.items() if k not in ('points_history', 'version')}
+        return (
+            record['id'],
+            record.get('first_name', ''),
+            record.get('last_name', ''),
+            int(record.get('points', 0)),
+            json.dumps(record, ensure_ascii=False)
+        )
+
+    def _insert_history(self, member_id: int, entries: List[Dict]):
+        """Insert history entries for a member"""
+        self._conn.executemany(
+            "INSERT INTO points_history (member_id, timestamp, old_points, new_points, change, reason) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(member_id, e.get('timestamp', ''), e.get('old_points', 0), e.get('new_points', 0),
+              e.get('change', 0), e.get('reason', '')) for e in entries]
+        )
+
+    def _insert_member(self, member_data: Dict) -> int:
+        """Insert a member (and any inline history), return its row id"""
+        if not member_data.get('id') or self._row_id(member_data['id']) is not None:
+            member_data['id'] = new_member_id()
+        cursor = self._conn.execute(
+            "INSERT INTO members (uid, first_name, last_name, points, data, version) VALUES (?, ?, ?, ?, ?, ?)",
+            self._member_columns(member_data) + (int(member_data.get('version', 0)),)
+        )
+        member_id = cursor.lastrowid
+        if member_data.get('points_history'):
+            self._insert_history(member_id, member_data['points_history'])
+        return member_id
+
+    @staticmethod
+    def _rows_to_members(rows: List[sqlite3.Row]) -> List[Dict]:
+        """Rebuild member dicts from member rows (points history is read separately)"""
+        members = []
+        for row in rows:
+            member = json.loads(row['data'])
+            member['points'] = row['points']
+            member['version'] = row['version']
+            members.append(member)
+        return members
+
+    def _replace_all(self, members: Iterable[Dict]):
+        """Replace the whole dataset in one transaction (rolled back if reading ``members`` fails)"""
+        with self._transaction():
+            self._conn.execute("DELETE FROM points_history")
+            self._conn.execute("DELETE FROM members")
+            for member in members:
+                self._insert_member(member)
+        self.data_version += 1
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def import_json(self, json_file: str) -> int:
+        """Replace the database contents with a JSON store (any snapshot format), return the member count
+
+        The store is read through a DataManager, so each member's points
+        history (kept in the store's history directory) comes along, and a
+        journaled store's changes since its last compaction are replayed.
+        """
+        source = DataManager(json_file, journal=os.path.exists(f"{json_file}.journal"))
+        members = source.get_all_members()
+
+        def with_history():
+            for member in members:
+                yield dict(member, points_history=list(source.iter_member_history_by_id(member['id'])))
+
+        with self._lock:
+            self._replace_all(with_history())
+        return len(members)
+
+    def add_member(self, member_data: Dict) -> bool:
+        """Add a new member (a fresh id is assigned unless a unique one is given)"""
+        try:
+            # Ensure points field exists
+            if 'points' not in member_data:
+                member_data['points'] = 0
+
+            with self._transaction():
+                self._insert_member(member_data)
+            self.data_version += 1
+            return True
+        except Exception as e:
+            print(f"Error adding member: {e}")
+            return False
+
+    def add_members(self, members: List[Dict]) -> bool:
+        """Add many members in one transaction"""
+        try:
+            with self._transaction():
+                for member_data in members:
+                    member_data.setdefault('points', 0)
+                    self._insert_member(member_data)
+            self.data_version += 1
+            return True
+        except Exception as e:
+            print(f"Error adding members: {e}")
+            return False
+
+    def get_all_members(self) -> List[Dict]:
+        """Get all members"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM members ORDER BY id").fetchall()
+            return self._rows_to_members(rows)
+
+    def get_member_by_id(self, member_id: str) -> Optional[Dict]:
+        """Get a specific member by id"""
+        try:
+            with self._lock:
+                rows = self._conn.execute("SELECT * FROM members WHERE uid = ?", (member_id,)).fetchall()
+                return self._rows_to_members(rows)[0] if rows else None
+        except Exception as e:
+            print(f"Error getting member: {e}")
+            return None
+
+    def update_member_by_id(self, member_id: str, updated_data: Dict,
+                            expected_version: Optional[int] = None) -> bool:
+        """Update a member's information by id (points history is kept unless given)
+
+        With ``expected_version`` the update is refused (False) if the member
+        has changed since that version was read.
+        """
+        try:
+            with self._transaction():
+                row = self._conn.execute(
+                    "SELECT id, points, version FROM members WHERE uid = ?", (member_id,)
+                ).fetchone()
+                if row is None or self._is_stale({'id': member_id, 'version': row['version']}, expected_version):
+                    return False
+                row_id = row['id']
+
+                # Preserve points if not in updated data
+                if 'points' not in updated_data:
+                    updated_data['points'] = row['points']
+                updated_data['id'] = member_id
+
+                self._conn.execute(
+                    "UPDATE members SET uid = ?, first_name = ?, last_name = ?, points = ?, data = ?, "
+                    "version = version + 1 WHERE id = ?",
+                    self._member_columns(updated_data) + (row_id,)
+                )
+                if 'points_history' in updated_data:
+                    self._conn.execute("DELETE FROM points_history WHERE member_id = ?", (row_id,))
+                    self._insert_history(row_id, updated_data['points_history'])
+            self.data_version += 1
+            return True
+        except Exception as e:
+            print(f"Error updating member: {e}")
+            return False
+
+    def update_member_points_by_id(self, member_id: str, new_points: int, reason: str = "",
+                                   expected_version: Optional[int] = None) -> bool:
+        """Update a member's points by id and log the change (refused if ``expected_version`` is stale)"""
+        try:
+            with self._transaction():
+                row = self._conn.execute(
+                    "SELECT id, points, version FROM members WHERE uid = ?", (member_id,)
+                ).fetchone()
+                if row is None or self._is_stale({'id': member_id, 'version': row['version']}, expected_version):
+                    return False
+
+                # Ensure points don't go negative
+                self._conn.execute(
+                    "UPDATE members SET points = ?, version = version + 1 WHERE id = ?",
+                    (max(0, new_points), row['id'])
+                )
+                self._insert_history(row['id'], [{
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'old_points': row['points'],
+                    'new_points': new_points,
+                    'change': new_points - row['points'],
+                    'reason': reason
+                }])
+            self.data_version += 1
+            return True
+        except Exception as e:
+            print(f"Error updating member points: {e}")
+            return False
+
+    def apply_points_batch(self, entries: List[tuple]) -> bool:
+        """Apply many (member, delta, reason) point changes in a single transaction
+
+        ``member`` is a member id or a list index. Every entry is validated
+        before anything is applied; if any entry is invalid nothing changes.
+        """
+        try:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            with self._transaction():
+                running = {}
+                history = []
+                for entry in entries:
+                    problem = self._validate_batch_entry(entry)
+                    member_ref = None if problem else entry[0]
+                    if isinstance(member_ref, int) and not isinstance(member_ref, bool):
+                        member_ref = self._id_at(member_ref)
+                    row = None
+                    if isinstance(member_ref, str):
+                        row = self._conn.execute(
+                            "SELECT id, points FROM members WHERE uid = ?", (member_ref,)
+                        ).fetchone()
+                    if problem or row is None:
+                        print(f"Invalid points batch entry {entry!r}: {problem or 'unknown member'}")
+                        return False
+
+                    _, delta, reason = entry
+                    old_points = running.get(row['id'], row['points'])
+                    new_points = max(0, old_points + delta)  # Ensure points don't go negative
+                    running[row['id']] = new_points
+                    history.append((row['id'], timestamp, old_points, new_points, new_points - old_points, reason))
+
+                self._conn.executemany(
+                    "UPDATE members SET points = ?, version = version + 1 WHERE id = ?",
+                    [(points, row_id) for row_id, points in running.items()]
+                )
+                self._conn.executemany(
+                    "INSERT INTO points_history (member_id, timestamp, old_points, new_points, change, reason) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    history
+                )
+            if history:
+                self.data_version += 1
+            return True
+        except Exception as e:
+            print(f"Error applying points batch: {e}")
+            return False
+
+    def get_member_history_by_id(self, member_id: str, offset: int = 0, limit: Optional[int] = None) -> list:
+        """Get points history entries ``offset`` .. ``offset + limit`` for a member by id (oldest first)"""
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT h.* FROM points_history h JOIN members m ON m.id = h.member_id "
+                    "WHERE m.uid = ? ORDER BY h.id LIMIT ? OFFSET ?",
+                    (member_id, -1 if limit is None else max(0, limit), max(0, offset))
+                )
+                return [{field: row[field] for field in HISTORY_FIELDS} for row in rows]
+        except Exception as e:
+            print(f"Error getting member history: {e}")
+            return []
+
+    def get_member_history_count_by_id(self, member_id: str) -> int:
+        """Number of points history entries for a member by id"""
+        try:
+            with self._lock:
+                return self._conn.execute(
+                    "SELECT COUNT(*) FROM points_history h JOIN members m ON m.id = h.member_id "
+                    "WHERE m.uid = ?", (member_id,)
+                ).fetchone()[0]
+        except Exception as e:
+            print(f"Error counting member history: {e}")
+            return 0
+
+    def delete_member_by_id(self, member_id: str) -> bool:
+        """Delete a member by id"""
+        try:
+            with self._transaction():
+                cursor = self._conn.execute("DELETE FROM members WHERE uid = ?", (member_id,))
+            if cursor.rowcount == 0:
+                return False
+            self.data_version += 1
+            return True
+        except Exception as e:
+            print(f"Error deleting member: {e}")
+            return False
+
+    def query_members(self, search: str = "", sort_by: str = "added", offset: int = 0,
+                      limit: Optional[int] = None) -> Tuple[int, List[Dict]]:
+        """Search, sort and page through members, return (total matches, requested page)
+
+        ``search`` matches anywhere in "first_name last_name"; ``sort_by`` is
+        one of ``MEMBER_SORT_KEYS`` ('name' orders by last name, then first).
+        """
+        if sort_by not in MEMBER_SORT_KEYS:
+            raise ValueError(f"Unknown sort order: {sort_by}")
+
+        where, params = "", ()
+        needle = search.strip()
+        if needle:
+            escaped = needle.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where = "WHERE (first_name || ' ' || last_name) LIKE ? ESCAPE '\\'"
+            params = (f"%{escaped}%",)
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM members {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM members {where} ORDER BY {MEMBER_ORDER_BY[sort_by]} LIMIT ? OFFSET ?",
+                params + (-1 if limit is None else max(0, limit), max(0, offset))
+            ).fetchall()
+        return total, self._rows_to_members(rows)
+
+    def iter_members(self, sort_by: str = "added", batch_size: int = 500) -> Iterator[Dict]:
+        """Yield every member in ``sort_by`` order, reading ``batch_size`` rows at a time"""
+        offset = 0
+        while True:
+            _, members = self.query_members(sort_by=sort_by, offset=offset, limit=batch_size)
+            yield from members
+            if len(members) < batch_size:
+                return
+            offset += batch_size
+
+    def get_leaderboard(self, limit: Optional[int] = None) -> List[Dict]:
+        """Get members sorted by points (highest first), optionally only the top ``limit``"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM members ORDER BY points DESC, id LIMIT ?",
+                (-1 if limit is None else limit,)
+            ).fetchall()
+            return self._rows_to_members(rows)
+
+    def get_member_rank(self, member_id: str) -> Optional[int]:
+        """1-based leaderboard position of a member"""
+        with self._lock:
+            row = self._conn.execute("SELECT id, points FROM members WHERE uid = ?", (member_id,)).fetchone()
+            if row is None:
+                return None
+            ahead = self._conn.execute(
+                "SELECT COUNT(*) FROM members WHERE points > ? OR (points = ? AND id < ?)",
+                (row['points'], row['points'], row['id'])
+            ).fetchone()[0]
+        return ahead + 1
+
+    def get_member_percentile(self, member_id: str) -> Optional[float]:
+        """Share of members (0-100) with fewer points than this member"""
+        with self._lock:
+            row = self._conn.execute("SELECT points FROM members WHERE uid = ?", (member_id,)).fetchone()
+            if row is None:
+                return None
+            below, total = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM members WHERE points < ?), (SELECT COUNT(*) FROM members)",
+                (row['points'],)
+            ).fetchone()
+        return 100.0 * below / total
+
+    def get_members_in_level_range(self, min_level: int, max_level: Optional[int] = None) -> List[Dict]:
+        """Members whose level is between min_level and max_level (inclusive), highest points first"""
+        min_points, max_points = self.level_rules.points_range(min_level, max_level)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM members WHERE points >= ? AND points <= ? ORDER BY points DESC, id",
+                (min_points, max_points if max_points is not None else 2 ** 63 - 1)
+            ).fetchall()
+        return self._rows_to_members(rows)
+
+    def get_member_progress(self, member_id: str) -> Optional[Dict]:
+        """Derived level, points_in_level, points_for_next and badges for a member"""
+        with self._lock:
+            row = self._conn.execute("SELECT points FROM members WHERE uid = ?", (member_id,)).fetchone()
+        return self.level_rules.progress(row['points']) if row else None
+
+    def get_level_distribution(self) -> Dict[int, int]:
+        """Number of members at each level"""
+        rules = self.level_rules
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CASE WHEN points < ? THEN 0 ELSE 1 + (points - ?) / ? END AS level, COUNT(*) AS members "
+                "FROM members GROUP BY level",
+                (rules.first_level_points, rules.first_level_points, rules.points_per_level)
+            ).fetchall()
+        return {row['level']: row['members'] for row in rows}
+
+    def set_level_rules(self, level_rules: LevelRules):
+        """Switch to a new rule table (levels are computed per query, so nothing to rebuild)"""
+        self.level_rules = level_rules
+
+    def get_member_count(self) -> int:
+        """Get total number of members"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+
+    def restore_from(self, f: TextIO, progress: Optional[Callable[[int], None]] = None) -> bool:
+        """Replace all data with a backup read incrementally, in one transaction"""
+        try:
+            with self._lock:
+                self._replace_all(iter_backup_records(f, progress))
+            return True
+        except Exception as e:
+            print(f"Error restoring backup: {e}")
+            return False
+
+    def clear_all_data(self) -> bool:
+        """Clear all member data (use with caution)"""
+        try:
+            with self._lock:
+                self._replace_all([])
+            return True
+        except Exception as e:
+            print(f"Error clearing data: {e}")
+            return False
+
+    def flush(self) -> bool:
+        """Nothing to flush: every change is committed in its own transaction"""
+        return True
+
+    def _check_storage(self, member_ids) -> List[str]:
+        """SQLite's own integrity and foreign key checks"""
+        with self._lock:
+            problems = [row[0] for row in self._conn.execute("PRAGMA integrity_check") if row[0] != 'ok']
+            problems += [f"History row {row[1]} refers to a missing member"
+                         for row in self._conn.execute("PRAGMA foreign_key_check(points_history)")]
+        return problems
+
+    def data_key(self) -> tuple:
+        """Token that is equal for any two managers holding the same data (bumped by every write transaction)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'store_version'").fetchone()
+        return (os.path.abspath(self.data_file), row['value'])
+
+    def compact(self) -> bool:
+        """Reclaim space left by deleted rows"""
+        try:
+            with self._lock:
+                self._conn.execute("VACUUM")
+            return True
+        except Exception as e:
+            print(f"Error compacting database: {e}")
+            return False
+
+    def convert_format(self, snapshot_format: str) -> bool:
+        """Snapshot formats apply to the JSON stores only"""
+        print(f"Error converting format: the SQLite store has no {snapshot_format} snapshot")
+        return False
+
+
+def migrate_json_to_sqlite(json_file: str = "members_data.json", db_file: str = "members_data.db") -> int:
+    """One-shot migration of a JSON data file into an SQLite database, return the member count"""
+    manager = SQLiteDataManager(db_file)
+    try:
+        return manager.import_json(json_file)
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "members_data.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else "members_data.db"
+    print(f"Migrated {migrate_json_to_sqlite(source, target)} members from {source} to {target}")
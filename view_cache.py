@@ -0,0 +1,109 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+
+def _size_of(value) -> int:
+    """Rough memory footprint of a cached view"""
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if hasattr(value, 'memory_usage'):
+        # pandas DataFrame
+        return int(value.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+
+class ViewCache:
+    """Process-wide memo of views derived from the member data
+
+    A view is cached under its name, the store's ``data_key()`` and any
+    extra parameters, so it is shared by every session looking at the same
+    data and recomputed only after a change (which changes the data key).
+    Concurrent requests for a view that is not cached yet wait for the one
+    computing it instead of computing it again. The least recently used
+    views are evicted beyond ``max_entries`` or ``max_bytes``.
+
+    Cached values are shared between sessions: treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, view: str, data_manager, compute: Callable[[], object], *params):
+        """The cached view for the data manager's current data, computing it if needed"""
+        key = (view, data_manager.data_key()) + params
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Someone else is computing it; if they fail, try ourselves
+            event.wait()
+
+        try:
+            value = compute()
+            self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def _store(self, key: Hashable, value):
+        """Cache a computed view, evicting the least recently used beyond the limits"""
+        size = _size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries[key][1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                              or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached view"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Hit, miss and eviction counters and current occupancy"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+_view_cache: Optional[ViewCache] = None
+_view_cache_lock = threading.Lock()
+
+
+def get_view_cache() -> ViewCache:
+    """The process-wide view cache, shared by every Streamlit session"""
+    global _view_cache
+    with _view_cache_lock:
+        if _view_cache is None:
+            _view_cache = ViewCache()
+        return _view_cache